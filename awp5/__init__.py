@@ -5,13 +5,77 @@
 # information.
 # ---------------
 
+import atexit
 import logging
+import os
+import signal
+import threading
+import time
+from logging.handlers import MemoryHandler
 from .base.connection import Connection
+from .base.statcache import stat_cache
 
 __all__ = ["base", "api"]
 cli_version="5.6.3"
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-logger.addHandler(logging.NullHandler())
+logger.setLevel(os.getenv('AWP5_LOGLEVEL', 'WARNING').upper())
+if not logger.handlers:
+    logger.addHandler(logging.NullHandler())
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 screenformater = logging.Formatter('%(levelname)s - %(message)s')
+
+
+def _flush_periodically(handler, interval):
+    # MemoryHandler.close() drops the target, which ends the loop
+    while handler.target is not None:
+        time.sleep(interval)
+        handler.flush()
+
+
+def _flush_on_sigterm(handler):
+    # only take over the default action, so an application's own SIGTERM
+    # handler is left alone
+    if (threading.current_thread() is not threading.main_thread() or
+            signal.getsignal(signal.SIGTERM) != signal.SIG_DFL):
+        return
+
+    def flush_and_terminate(signum, frame):
+        handler.flush()
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+    signal.signal(signal.SIGTERM, flush_and_terminate)
+
+
+def log_to_file(filename='awp5_cli.log', level=logging.DEBUG, capacity=1024,
+                flush_interval=30):
+    """
+    Writes the awp5 log records to 'filename'. The records are buffered in
+    memory and written to the file in batches of 'capacity' records, whenever
+    a record of level ERROR or above is logged, every 'flush_interval'
+    seconds, on SIGTERM and at interpreter exit, so chatty debug logging does
+    not cost one write per record.
+    The awp5 logger level is lowered to 'level' if needed.
+    Calling it again for the same file returns the already attached handler
+    instead of adding a second one.
+    Returns the buffering handler.
+    """
+    path = os.path.abspath(filename)
+    for handler in logger.handlers:
+        if (isinstance(handler, MemoryHandler) and handler.target and
+                handler.target.baseFilename == path):
+            return handler
+    target = logging.FileHandler(filename)
+    target.setLevel(level)
+    target.setFormatter(formatter)
+    fh = MemoryHandler(capacity=capacity, flushLevel=logging.ERROR,
+                       target=target)
+    fh.setLevel(level)
+    if logger.getEffectiveLevel() > level:
+        logger.setLevel(level)
+    logger.addHandler(fh)
+    atexit.register(fh.flush)
+    _flush_on_sigterm(fh)
+    if flush_interval:
+        threading.Thread(target=_flush_periodically,
+                         args=(fh, flush_interval), daemon=True).start()
+    return fh
@@ -13,14 +13,25 @@ archive index database.
 The archive entry is generated for each file added to the archive selection.
 Please see the ArchiveSelection resource description for details upon creation.
 """
-from awp5.base.connection import P5Resource, exec_nsdchat
-from awp5.base.helpers import resourcelist, onereturnvalue
+import sys
+from awp5.base.connection import P5Resource, exec_nsdchat, exec_nsdchat_batch
+from awp5.base.helpers import resourcelist, resourceiter, onereturnvalue
+from awp5.base.helpers import singlevalue
+from awp5.base.parallel import pmap
 from awp5.api.archiveindex import ArchiveIndex
 from awp5.api.client import Client
 
 module_name = "ArchiveEntry"
 
 
+def _clippath_option(newpath):
+    # empty arguments are not passed to nsdchat, so the empty string that
+    # deletes the clip has to be sent as an empty Tcl word
+    if newpath is None:
+        return []
+    return [newpath or "{}"]
+
+
 @onereturnvalue
 def handle(client, path, database=None, as_object=False, p5_connection=None):
     """
@@ -37,6 +48,8 @@ def handle(client, path, database=None, as_object=False, p5_connection=None):
     has been indexed. If omitted, the standard Default-Archive database is
     used. If no such database could be found in the current P5 configuration,
     an error is triggered.
+    If 'as_object' is set to "lazy", a generator creating the ArchiveEntry
+    objects on iteration is returned instead of a list.
     Return Values:
     -On Success:    the handle of the entry
     """
@@ -45,6 +58,8 @@ def handle(client, path, database=None, as_object=False, p5_connection=None):
                           p5_connection)
     if not as_object:
         return result
+    elif as_object == "lazy":
+        return resourceiter(result, ArchiveEntry, p5_connection)
     else:
         return resourcelist(result, ArchiveEntry, p5_connection)
 
@@ -88,8 +103,10 @@ def meta(archiveentry_handle, key=None, p5_connection=None):
                     the list of all the meta keys and their values
     """
     method_name = "meta"
-    return exec_nsdchat([module_name, archiveentry_handle, method_name,
-                        key], p5_connection)
+    cmd = [module_name, archiveentry_handle, method_name]
+    if key is not None:
+        cmd.append(key)
+    return exec_nsdchat(cmd, p5_connection)
 
 
 def setmeta(archiveentry_handle, key_value_list, p5_connection=None):
@@ -178,8 +195,8 @@ def clippath(archiveentry_handle, newpath=None, p5_connection=None):
                     or the string "unknown" if not found
     """
     method_name = "clippath"
-    return exec_nsdchat([module_name, archiveentry_handle, method_name],
-                        p5_connection)
+    return exec_nsdchat([module_name, archiveentry_handle, method_name] +
+                        _clippath_option(newpath), p5_connection)
 
 
 @onereturnvalue
@@ -197,10 +214,50 @@ def clipurl(archiveentry_handle, host, port, p5_connection=None):
                         port])
 
 
+_queries = {"btime": btime, "mtime": mtime, "meta": meta, "size": size,
+            "status": status, "volume": volume, "clippath": clippath}
+
+
 class ArchiveEntry(P5Resource):
+    __slots__ = ('_cache', '_argv_head')
+
     def __init__(self, archiveentry_name, p5_connection=None):
-        super().__init__(archiveentry_name, p5_connection)
+        # handles are repeated in many result lists, share one string each
+        super().__init__(sys.intern(str(archiveentry_name)), p5_connection)
+        self._cache = {}
+        self._argv_head = (module_name, self.name)
+
+    def refresh(self):
+        """
+        Drops the values cached by btime, mtime, meta, size, status and
+        volume, so the next call queries the P5 server again. Those other
+        than status are only cached once status has returned "indexed", as
+        they are invalid before.
+        """
+        self._cache.clear()
+
+    def _store(self, key, result):
+        # errors are not cached and neither is the "unknown" status, as it
+        # changes once the entry has been archived; until then the other
+        # values are invalid, so they are only cached once a cached status
+        # tells the entry is indexed
+        if result is None or result == ["unknown"]:
+            return result
+        if key[0] == "status" or ("status",) in self._cache:
+            self._cache[key] = list(result)
+        return result
+
+    def _cached_call(self, method_name, *args):
+        key = (method_name,) + args
+        if key in self._cache:
+            return list(self._cache[key])
+        return self._store(key, self._call(*key))
 
+    def _call(self, method_name, *args):
+        return self.p5_connection.nsdchat_call(self._argv_head +
+                                               (method_name,) + args)
+
+    @staticmethod
     @onereturnvalue
     def handle(client, path, database=None, as_object=True,
                p5_connection=None):
@@ -218,6 +275,8 @@ class ArchiveEntry(P5Resource):
         file has been indexed. If omitted, the standard Default-Archive
         database is used. If no such database could be found in the current P5
         configuration, an error is triggered.
+        If 'as_object' is set to "lazy", a generator creating the ArchiveEntry
+        objects on iteration is returned instead of a list.
         Return Values:
         -On Success:    the handle of the entry
         """
@@ -226,9 +285,67 @@ class ArchiveEntry(P5Resource):
                                database], p5_connection)
         if not as_object:
             return result
+        elif as_object == "lazy":
+            return resourceiter(result, ArchiveEntry, p5_connection)
         else:
             return resourcelist(result, ArchiveEntry, p5_connection)
 
+    @staticmethod
+    def batch(handles, fields=("btime", "mtime", "size", "status", "volume"),
+              p5_connection=None):
+        """
+        Queries the given 'fields' for each of the archive entry 'handles'
+        with one batch of nsdchat calls instead of one call after the other.
+        The 'fields' are the names of the ArchiveEntry query methods without
+        arguments: btime, mtime, size, status, volume, meta and clippath.
+        The values are also cached on the ArchiveEntry objects passed in
+        'handles', so their query methods do not call the P5 server again;
+        except for the status only if it is queried as well and tells the
+        entry is indexed.
+        Return Values:
+        -On Success:    a dict mapping each handle to a dict of the field
+                        names and their values
+        """
+        handles = list(handles)
+        cmds = [[module_name, str(handle), field] for handle in handles
+                for field in fields]
+        results = iter(exec_nsdchat_batch(cmds, p5_connection))
+        batch_result = {}
+        for handle in handles:
+            raw = dict(zip(fields, results))
+            if isinstance(handle, ArchiveEntry):
+                # the status first, the other values are only cached if it
+                # tells the entry is indexed
+                for field in sorted(raw, key=lambda field: field != "status"):
+                    if field != "clippath":
+                        handle._store((field,), raw[field])
+            values = {}
+            for field, value in raw.items():
+                if field in ("status", "clippath") and value is not None:
+                    value = singlevalue(value)
+                values[field] = value
+            batch_result[str(handle)] = values
+        return batch_result
+
+    @staticmethod
+    def map(handles, method, workers=8, p5_connection=None):
+        """
+        Calls the query 'method' for all archive entry 'handles' concurrently
+        with up to 'workers' threads, each using its own pooled connection.
+        The 'method' is the name of one of the read-only ArchiveEntry methods
+        btime, mtime, meta, size, status, volume or clippath; setmeta is not
+        supported.
+        Return Values:
+        -On Success:    the list of results in the order of 'handles'
+        """
+        if method not in _queries:
+            raise ValueError("{} is not a read-only ArchiveEntry method"
+                             "".format(method))
+        query = _queries[method]
+        return pmap(lambda handle: query(str(handle),
+                                         p5_connection=p5_connection),
+                    handles, workers)
+
     def btime(self):
         """
         Syntax: ArchiveEntry <handle> btime
@@ -238,8 +355,7 @@ class ArchiveEntry(P5Resource):
         -On Success:    the list of backup times
         """
         method_name = "btime"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return self._cached_call(method_name)
 
     def mtime(self):
         """
@@ -250,8 +366,7 @@ class ArchiveEntry(P5Resource):
         -On Success:    the list of modification times
         """
         method_name = "mtime"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return self._cached_call(method_name)
 
     def meta(self, key=None):
         """
@@ -266,11 +381,9 @@ class ArchiveEntry(P5Resource):
                         the list of all the meta keys and their values
         """
         method_name = "meta"
-        key_option = ""
-        if key:
-            key_option = key
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, key_option])
+        if key is not None:
+            return self._cached_call(method_name, key)
+        return self._cached_call(method_name)
 
     def setmeta(self, key_value_list):
         """
@@ -283,8 +396,9 @@ class ArchiveEntry(P5Resource):
         -On Success:    the newly set key/value pair
         """
         method_name = "setmeta"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, key_value_list])
+        for key in [key for key in self._cache if key[0] == "meta"]:
+            del self._cache[key]
+        return self._call(method_name, key_value_list)
 
     def size(self):
         """
@@ -295,8 +409,7 @@ class ArchiveEntry(P5Resource):
         -On Success:    the list of file sizes
         """
         method_name = "size"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return self._cached_call(method_name)
 
     @onereturnvalue
     def status(self):
@@ -318,8 +431,7 @@ class ArchiveEntry(P5Resource):
         -On Success:    one of the supported statuses
         """
         method_name = "status"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return self._cached_call(method_name)
 
     def volume(self):
         """
@@ -336,8 +448,7 @@ class ArchiveEntry(P5Resource):
                         multiple volumes
         """
         method_name = "volume"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return self._cached_call(method_name)
 
     @onereturnvalue
     def clippath(self, newpath=None):
@@ -356,8 +467,7 @@ class ArchiveEntry(P5Resource):
                         or the string "unknown" if not found
         """
         method_name = "clippath"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, newpath])
+        return self._call(method_name, *_clippath_option(newpath))
 
     @onereturnvalue
     def clipurl(self, host, port):
@@ -371,8 +481,7 @@ class ArchiveEntry(P5Resource):
         -On Success:    the URL as a string
         """
         method_name = "clipurl"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, host, port])
+        return self._call(method_name, host, port)
 
     def __repr__(self):
         return ": ".join([module_name, self.name])
@@ -15,26 +15,71 @@ archive index databases. You can modify some configuration details of the
 existing databases and you can create new ones. If you need full control of
 ArchiveIndex resources, please use the P5 Web GUI.
 """
-from awp5.base.connection import P5Resource, exec_nsdchat
-from awp5.base.helpers import resourcelist, onereturnvalue
+import os
+from concurrent.futures import ThreadPoolExecutor
+from awp5.base import config, metacache
+from awp5.base.connection import P5Resource, Batch
+from awp5.base.connection import exec_nsdchat, submit_nsdchat
+from awp5.base.helpers import resourcelist, onereturnvalue, singlevalue
+from awp5.base.helpers import elements, outputfile_path, follow_rows
+from awp5.base.helpers import read_rows, LazyResourceList
+from awp5.base.parallel import pmap
 
 module_name = "ArchiveIndex"
 
 
-def names(as_object=False, p5_connection=None):
+def _cached(cmd, p5_connection, bypass_cache=False, batchable=False,
+            transform=None):
+    # names, keys, keyget and keyhas results are cached, see
+    # awp5.base.metacache. Only keyget and keyhas join a batch.
+    if batchable:
+        return metacache.submit_cached(cmd, p5_connection, transform,
+                                       bypass_cache)
+    result = metacache.cached(cmd, lambda: exec_nsdchat(cmd, p5_connection),
+                              p5_connection, bypass_cache)
+    if transform and result is not None:
+        return transform(result)
+    return result
+
+
+def _invalidate_keys(archiveindex_name, p5_connection):
+    for method_name in ("keys", "keyget", "keyhas", "inventory"):
+        metacache.invalidate([module_name, archiveindex_name, method_name],
+                             p5_connection)
+
+
+def _invalidate_key(archiveindex_name, key, p5_connection):
+    for method_name in ("keyget", "keyhas"):
+        metacache.invalidate([module_name, archiveindex_name, method_name,
+                              key], p5_connection)
+
+
+def _key_set(archiveindex_name, key, p5_connection):
+    # the keyset transform: the cached keyget and keyhas results of <key>
+    # are dropped once the value has been set, so neither a concurrent
+    # keyget nor one in the same batch can cache the old value again
+    def key_set(result):
+        _invalidate_key(archiveindex_name, key, p5_connection)
+        return singlevalue(result)
+    return key_set
+
+
+def names(as_object=False, p5_connection=None, bypass_cache=False):
     """
     Syntax: ArchiveIndex names
     Description: Returns the list of names of archive indexes.
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    a list of names. If no archive indexes are configured,
                     the command returns the string "<empty>"
     """
     method_name = "names"
-    result = exec_nsdchat([module_name, method_name], p5_connection)
+    result = _cached([module_name, method_name], p5_connection, bypass_cache)
     if not as_object:
         return result
     else:
-        return resourcelist(result, ArchiveIndex, p5_connection)
+        return LazyResourceList(result, ArchiveIndex, p5_connection)
 
 
 @onereturnvalue
@@ -53,6 +98,7 @@ def create(archiveindex_name, description, as_object=False,
     method_name = "create"
     result = exec_nsdchat([module_name, method_name, archiveindex_name,
                            description], p5_connection)
+    metacache.invalidate([module_name, "names"], p5_connection)
     if not as_object:
         return result
     else:
@@ -84,8 +130,10 @@ def restore(archiveindex_name, filename, p5_connection=None):
     -On Success:    the name of the backup file
     """
     method_name = "restore"
-    return exec_nsdchat([module_name, archiveindex_name, method_name,
-                        filename], p5_connection)
+    result = exec_nsdchat([module_name, archiveindex_name, method_name,
+                           filename], p5_connection)
+    metacache.invalidate([module_name, archiveindex_name], p5_connection)
+    return result
 
 
 def addkey(archiveindex_name, key, key_type, attr_value_list=None,
@@ -109,8 +157,10 @@ def addkey(archiveindex_name, key, key_type, attr_value_list=None,
     -On Success:    the names of all the configured keys
     """
     method_name = "addkey"
-    return exec_nsdchat([module_name, archiveindex_name, method_name, key,
-                        key_type, attr_value_list], p5_connection)
+    result = exec_nsdchat([module_name, archiveindex_name, method_name, key,
+                           key_type, attr_value_list], p5_connection)
+    _invalidate_keys(archiveindex_name, p5_connection)
+    return result
 
 
 def delkey(archiveindex_name, key, p5_connection=None):
@@ -121,26 +171,31 @@ def delkey(archiveindex_name, key, p5_connection=None):
     -On Success:    the names of all the deleted keys
     """
     method_name = "delkey"
-    return exec_nsdchat([module_name, archiveindex_name, method_name, key],
-                        p5_connection)
+    result = exec_nsdchat([module_name, archiveindex_name, method_name, key],
+                          p5_connection)
+    _invalidate_keys(archiveindex_name, p5_connection)
+    return result
 
 
-def keys(archiveindex_name, p5_connection=None):
+def keys(archiveindex_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: ArchiveIndex <name> keys
     Description: Reports all the user-defined meta keys for the index <name>.
     Meta keys are used to store user-given meta-data to selected elements of
     the archive index.
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    a list of keys
                     the string "<empty>" if no keys were defined
     """
     method_name = "keys"
-    return exec_nsdchat([module_name, archiveindex_name, method_name],
-                        p5_connection)
+    return _cached([module_name, archiveindex_name, method_name],
+                   p5_connection, bypass_cache)
 
 
-def keyget(archiveindex_name, key, attr=None, p5_connection=None):
+def keyget(archiveindex_name, key, attr=None, p5_connection=None,
+           bypass_cache=False):
     """
     Syntax: ArchiveIndex <name> keyget <key> [<attr>]
     Description: Returns the attributes for the given <key>. If no optional
@@ -149,27 +204,32 @@ def keyget(archiveindex_name, key, attr=None, p5_connection=None):
     <attr> attribute is returned.
     Each <key> has at least the type one attribute.
     Please see the addkey method for description of the type attribute.
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    either a list of all the defined attributes and values for
                     the given <key>, or just the attribute value, depending
                     on the existence of the optional argument <attr>
     """
-    method_name = "addkey"
-    return exec_nsdchat([module_name, archiveindex_name, method_name, key,
-                        attr], p5_connection)
+    method_name = "keyget"
+    return _cached([module_name, archiveindex_name, method_name, key, attr],
+                   p5_connection, bypass_cache, batchable=True)
 
 
 @onereturnvalue
-def keyhas(archiveindex_name, key, attr, p5_connection=None):
+def keyhas(archiveindex_name, key, attr, p5_connection=None,
+           bypass_cache=False):
     """
     Syntax: ArchiveIndex <name> keyhas <key> <attr>
     Description: Checks whether the <key> has attribute <attr> defined
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string "1" if yes, or "0" otherwise
     """
     method_name = "keyhas"
-    return exec_nsdchat([module_name, archiveindex_name, method_name, key,
-                        attr], p5_connection)
+    return _cached([module_name, archiveindex_name, method_name, key, attr],
+                   p5_connection, bypass_cache, True, singlevalue)
 
 
 @onereturnvalue
@@ -186,8 +246,9 @@ def keyset(archiveindex_name, key, attr, val, p5_connection=None):
                     does not exist
     """
     method_name = "keyset"
-    return exec_nsdchat([module_name, archiveindex_name, method_name, key,
-                        attr, val], p5_connection)
+    return submit_nsdchat([module_name, archiveindex_name, method_name, key,
+                           attr, val], p5_connection,
+                          _key_set(archiveindex_name, key, p5_connection))
 
 
 @onereturnvalue
@@ -245,24 +306,55 @@ def inventory(archiveindex_name, outputfile, options_list=None,
                          outputfile, options_list], p5_connection)
 
 
+_queries = ("keys", "keyget", "keyhas", "keys_with_attrs", "keys_full")
+
+
+def map_over_all(method, *args, max_workers=8, p5_connection=None):
+    """
+    Calls the ArchiveIndex query 'method' with 'args' for every archive
+    index concurrently, with up to 'max_workers' threads (at most
+    config.pool_size), each using its own pooled connection.
+    The 'method' is the name of one of the read-only ArchiveIndex methods
+    keys, keyget, keyhas, keys_with_attrs or keys_full.
+    Return Values:
+    -On Success:    a dict mapping the index names to the results
+    """
+    if method not in _queries:
+        raise ValueError("{} is not a read-only ArchiveIndex method"
+                         "".format(method))
+    indexes = names(True, p5_connection)
+    results = pmap(lambda index: getattr(index, method)(*args), indexes,
+                   min(max_workers, config.pool_size))
+    return {index.name: result for index, result in zip(indexes, results)}
+
+
 class ArchiveIndex(P5Resource):
     def __init__(self, archiveindex_name, p5_connection=None):
         super().__init__(archiveindex_name, p5_connection)
 
-    def names(as_object=True, p5_connection=None):
+    def _cmd(self, method_name, *args):
+        return (module_name, self.name, method_name) + args
+
+    def _call(self, method_name, *args):
+        return self.p5_connection.nsdchat_call(self._cmd(method_name, *args))
+
+    def names(as_object=True, p5_connection=None, bypass_cache=False):
         """
         Syntax: ArchiveIndex names
         Description: Returns the list of names of archive indexes.
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    a list of names. If no archive indexes are configured,
                         the command returns the string "<empty>"
         """
         method_name = "names"
-        result = exec_nsdchat([module_name, method_name], p5_connection)
+        result = _cached([module_name, method_name], p5_connection,
+                         bypass_cache)
         if not as_object:
             return result
         else:
-            return resourcelist(result, ArchiveIndex, p5_connection)
+            return LazyResourceList(result, ArchiveIndex, p5_connection)
 
     @onereturnvalue
     def create(archiveindex_name, description, as_object=True,
@@ -280,6 +372,7 @@ class ArchiveIndex(P5Resource):
         method_name = "create"
         result = exec_nsdchat([module_name, method_name, archiveindex_name,
                                description], p5_connection)
+        metacache.invalidate([module_name, "names"], p5_connection)
         if not as_object:
             return result
         else:
@@ -295,8 +388,7 @@ class ArchiveIndex(P5Resource):
         -On Success:    the file name of the backup file
         """
         method_name = "backup"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, filename])
+        return self._call(method_name, filename)
 
     @onereturnvalue
     def restore(self, filename):
@@ -309,8 +401,9 @@ class ArchiveIndex(P5Resource):
         -On Success:    the name of the backup file
         """
         method_name = "restore"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, filename])
+        result = self._call(method_name, filename)
+        metacache.invalidate([module_name, self.name], self.p5_connection)
+        return result
 
     def addkey(self, key, key_type, attr_value_list=None):
         """
@@ -333,9 +426,9 @@ class ArchiveIndex(P5Resource):
         -On Success:    the names of all the configured keys
         """
         method_name = "addkey"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, key, key_type,
-                                                attr_value_list])
+        result = self._call(method_name, key, key_type, attr_value_list)
+        _invalidate_keys(self.name, self.p5_connection)
+        return result
 
     def delkey(self, key):
         """
@@ -345,24 +438,27 @@ class ArchiveIndex(P5Resource):
         -On Success:    the names of all the deleted keys
         """
         method_name = "delkey"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, key])
+        result = self._call(method_name, key)
+        _invalidate_keys(self.name, self.p5_connection)
+        return result
 
-    def keys(self):
+    def keys(self, bypass_cache=False):
         """
         Syntax: ArchiveIndex <name> keys
         Description: Reports all the user-defined meta keys for the index
         <name>. Meta keys are used to store user-given meta-data to selected
         elements of the archive index.
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    a list of keys
                         the string "<empty>" if no keys were defined
         """
         method_name = "keys"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _cached(self._cmd(method_name),
+                       self.p5_connection, bypass_cache)
 
-    def keyget(self, key, attr=None):
+    def keyget(self, key, attr=None, bypass_cache=False):
         """
         Syntax: ArchiveIndex <name> keyget <key> [<attr>]
         Description: Returns the attributes for the given <key>. If no optional
@@ -371,27 +467,31 @@ class ArchiveIndex(P5Resource):
         value of the <attr> attribute is returned.
         Each <key> has at least the type one attribute.
         Please see the addkey method for description of the type attribute.
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    either a list of all the defined attributes and values
                         for the given <key>, or just the attribute value,
                         depending on the existence of the optional argument
                         <attr>
         """
-        method_name = "addkey"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, key, attr])
+        method_name = "keyget"
+        return _cached(self._cmd(method_name, key, attr),
+                       self.p5_connection, bypass_cache, batchable=True)
 
     @onereturnvalue
-    def keyhas(self, key, attr):
+    def keyhas(self, key, attr, bypass_cache=False):
         """
         Syntax: ArchiveIndex <name> keyhas <key> <attr>
         Description: Checks whether the <key> has attribute <attr> defined
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string "1" if yes, or "0" otherwise
         """
         method_name = "keyhas"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, key, attr])
+        return _cached(self._cmd(method_name, key, attr),
+                       self.p5_connection, bypass_cache, True, singlevalue)
 
     @onereturnvalue
     def keyset(self, key, attr, val):
@@ -407,8 +507,9 @@ class ArchiveIndex(P5Resource):
                         does not exist
         """
         method_name = "keyset"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, key, attr, val])
+        return submit_nsdchat(self._cmd(method_name, key, attr, val),
+                              self.p5_connection,
+                              _key_set(self.name, key, self.p5_connection))
 
     @onereturnvalue
     def inventory(self, outputfile, options_list=None):
@@ -461,9 +562,95 @@ class ArchiveIndex(P5Resource):
         -On Success:    the <client>:<output file>
         """
         method_name = "inventory"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, outputfile,
-                                                options_list])
+        return self._call(method_name, outputfile, options_list)
+
+    def inventory_rows(self, outputfile, options_list=None,
+                       bypass_cache=False):
+        """
+        Runs inventory (see there) and returns an iterator over the records
+        of <output file> as tuples of the TAB separated fields. The file is
+        read memory mapped.
+        If this index was inventoried to the same <output file> with the same
+        <options> a short time ago (see awp5.base.metacache), that file is
+        read again instead of scanning the index once more, unless
+        bypass_cache=True or the file is gone. Restoring the index and adding
+        or deleting keys through this module drop the cached inventory.
+        The <output file> must be written to localhost: and readable by this
+        process.
+        """
+        path = outputfile_path(outputfile)
+        if path is None:
+            raise ValueError("inventory_rows requires an output file on "
+                             "localhost, got '{}'".format(outputfile))
+        result = _cached(self._cmd("inventory", outputfile, options_list),
+                         self.p5_connection,
+                         bypass_cache or not os.path.exists(path))
+        if result is None:
+            return iter(())
+        return read_rows(path)
+
+    def inventory_stream(self, outputfile, options_list=None,
+                         chunk_size=65536, poll_interval=0.5):
+        """
+        Runs inventory (see there) and yields the records of <output file> as
+        tuples of the TAB separated fields while P5 is still writing it, so
+        large indexes can be processed before the inventory has finished.
+        The <output file> must be written to localhost: and readable by this
+        process, and must not exist yet, so no stale records are read. The
+        inventory runs in a worker thread on a borrowed connection (see
+        awp5.base.connection.borrow).
+        """
+        path = outputfile_path(outputfile)
+        if path is None:
+            raise ValueError("inventory_stream requires an output file on "
+                             "localhost, got '{}'".format(outputfile))
+        if os.path.exists(path):
+            raise ValueError("inventory_stream requires a new output file, "
+                             "'{}' exists".format(outputfile))
+        with ThreadPoolExecutor(1) as executor:
+            future = executor.submit(exec_nsdchat,
+                                     self._cmd("inventory", outputfile,
+                                               options_list),
+                                     self.p5_connection)
+            yield from follow_rows(path, future, chunk_size, poll_interval)
+
+    def batch(self):
+        """
+        Returns a Batch context manager. Inside its with block keyget, keyhas
+        and keyset called on this index return a concurrent.futures.Future
+        and their commands are executed together when the block is left:
+
+            with index.batch():
+                has_type = [index.keyhas(key, "type") for key in keys]
+            print([future.result() for future in has_type])
+        """
+        return Batch(self.p5_connection)
+
+    def keys_with_attrs(self):
+        """
+        Returns a dict mapping each user-defined key of the index to the
+        list of its attributes and values as returned by keyget. The keyget
+        commands for all keys are executed in one batch, so this costs two
+        round-trips instead of one plus one per key.
+        """
+        keys = [key for key in self.keys() or () if key != "<empty>"]
+        with self.batch():
+            attrs = [self.keyget(key) for key in keys]
+        return {key: future.result() for key, future in zip(keys, attrs)}
+
+    def keys_full(self):
+        """
+        Returns a dict mapping each user-defined key of the index to a dict
+        of its attributes and their values, e.g.
+        {"project": {"type": "C", "label": "Project"}}.
+        Like keys_with_attrs it costs two round-trips to the P5 server, use it
+        instead of calling keyget for each key.
+        """
+        result = {}
+        for key, attrs in self.keys_with_attrs().items():
+            words = iter(elements(attrs or ()))
+            result[key] = dict(zip(words, words))
+        return result
 
     def __repr__(self):
         return ": ".join([module_name, self.name])
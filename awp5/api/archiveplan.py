@@ -17,15 +17,58 @@ archive plans. You can modify some configuration details of existing plans and
 you can create new archive plans. If you need full control of ArchivePlan
 resources, please use the P5 Web GUI.
 """
-from awp5.base.connection import P5Resource, exec_nsdchat
-from awp5.base.helpers import resourcelist, onereturnvalue
-from awp5.api.client import Client
-from awp5.api.pool import Pool
-from awp5.api.job import Job
+from awp5.base import metacache
+from awp5.base.connection import P5Resource, Batch, exec_nsdchat
+from awp5.base.connection import submit_nsdchat, async_query_nsdchat
+from awp5.base.connection import batch_for
+from awp5.base.helpers import resource, resourcelist, unwrap
 
 module_name = "ArchivePlan"
 
 
+# options appended to run and submit, indexed by the delete and now flags
+_run_options = ((), ("-delete", "-1"))
+_submit_options = ((), ("now",))
+
+
+def _pool():
+    # Pool and Job objects are only built for as_object=True, so their
+    # modules are imported on first use instead of with this one
+    from awp5.api.pool import Pool
+    return Pool
+
+
+def _job():
+    from awp5.api.job import Job
+    return Job
+
+
+def _transform(resource_class, p5_connection):
+    # the wrappers return the unwrapped result, or the resource object(s)
+    # named by it; applied by submit_nsdchat, so batched calls resolve their
+    # Future to the same value
+    if not resource_class:
+        return unwrap
+    return lambda result: resource(result, resource_class, p5_connection)
+
+
+def _change(cmd, p5_connection, transform=unwrap):
+    # submits 'cmd', which changes the plan cmd[:2] names, so its cached
+    # queries are dropped once it has completed
+    return submit_nsdchat(cmd, p5_connection,
+                          metacache.invalidating(cmd[:2], p5_connection,
+                                                 transform))
+
+
+def _setting(cmd, value, p5_connection, bypass_cache, transform=unwrap):
+    # 'cmd' queries the setting, with 'value' appended it sets it; queried
+    # values are cached, setting one drops the cached values of the plan
+    if value:
+        return _change(tuple(cmd) + (value,), p5_connection, transform)
+    return metacache.submit_cached(cmd, p5_connection, transform,
+                                   bypass_cache)
+
+
 def names(as_object=False, p5_connection=None):
     """
     Syntax: ArchivePlan names
@@ -43,79 +86,88 @@ def names(as_object=False, p5_connection=None):
         return resourcelist(str_list, ArchivePlan, p5_connection)
 
 
-@onereturnvalue
-def describe(archiveplan_name, p5_connection=None):
+def describe(archiveplan_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: ArchivePlan <name> describe
     Description: Returns a human-readable description of the archive plan
     <name>.
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the plan description. If no description has been set
                     the command returns the string "<empty>"
     """
     method_name = "describe"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return metacache.submit_cached([module_name, archiveplan_name,
+                                    method_name], p5_connection, unwrap,
+                                   bypass_cache)
 
 
-@onereturnvalue
-def enabled(archiveplan_name, p5_connection=None):
+def enabled(archiveplan_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: ArchivePlan <name> enabled
     Description: Queries the plan Enabled status
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string "1" (plan is enabled) or "0" (not enabled)
     """
     method_name = "enabled"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return metacache.submit_cached([module_name, archiveplan_name,
+                                    method_name], p5_connection, unwrap,
+                                   bypass_cache)
 
 
-@onereturnvalue
-def disabled(archiveplan_name, p5_connection=None):
+def disabled(archiveplan_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: ArchivePlan <name> disabled
     Description: Queries the plan Disabled status
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string "1" (the plan is disabled) or "0" (not disabled)
     """
     method_name = "disabled"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return metacache.submit_cached([module_name, archiveplan_name,
+                                    method_name], p5_connection, unwrap,
+                                   bypass_cache)
 
 
-@onereturnvalue
-def incrlevel(archiveplan_name, p5_connection=None):
+def incrlevel(archiveplan_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: ArchivePlan <name> incrlevel
     Description: Queries the plan incremental status
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string "1" (plan is incremental)
                     or "0" (plan runs full)
     """
     method_name = "incrlevel"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return metacache.submit_cached([module_name, archiveplan_name,
+                                    method_name], p5_connection, unwrap,
+                                   bypass_cache)
 
 
-@onereturnvalue
-def autostart(archiveplan_name, p5_connection=None):
+def autostart(archiveplan_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: ArchivePlan <name> autostart
     Description: Returns the autostart setting for the Archive plan <name>. If
     the Archive plan is set to autostart, the returned value is "1", otherwise
     it is ""0".
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string "1" (plan is set to autostart)
                     the string "0" (plan is not set to autostart)
     """
     method_name = "autostart"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return metacache.submit_cached([module_name, archiveplan_name,
+                                    method_name], p5_connection, unwrap,
+                                   bypass_cache)
 
 
-@onereturnvalue
-def create(description, as_object=False, p5_connection=None):
+def create(description, as_object=False, p5_connection=None, prefetch=()):
     """
     Syntax: ArchivePlan create <description>
     Description: Creates a new archive plan with the given <description>. If an
@@ -124,18 +176,17 @@ def create(description, as_object=False, p5_connection=None):
     using the database, pool and/or copypool methods described below.
     If not further configured, the newly generated plan will per-default use
     the Default-Archive pool and the Default-Archive database.
+    The read-only queries named in 'prefetch' (see list_details) are executed
+    for the new plan right away in one batch, so the usual follow-up queries
+    are answered from the metadata cache.
     Return Values:
     -On Success:    the name of the newly created plan
     """
     method_name = "create"
-    result = exec_nsdchat([module_name, method_name, description],
-                          p5_connection)
-    if as_object:
-        result = resourcelist(result, ArchivePlan, p5_connection)
-    return result
+    return _create([module_name, method_name, description], as_object,
+                   prefetch, p5_connection)
 
 
-@onereturnvalue
 def cancel(archiveplan_name, p5_connection=None):
     """
     Syntax: ArchivePlan <name> cancel
@@ -147,12 +198,12 @@ def cancel(archiveplan_name, p5_connection=None):
                     the string "0" (plan was not canceled or is not running)
     """
     method_name = "cancel"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return _change([module_name, archiveplan_name, method_name],
+                   p5_connection, unwrap)
 
 
-@onereturnvalue
-def database(archiveplan_name, value="", p5_connection=None):
+def database(archiveplan_name, value="", p5_connection=None,
+             bypass_cache=False):
     """
     Syntax: ArchivePlan <name> database [<value>]
     Description: Returns or sets the name of the index database resource
@@ -168,17 +219,20 @@ def database(archiveplan_name, value="", p5_connection=None):
     create archive index databases.
     Note that ArchivePlan requires that a database is set. Otherwise, the
     archive job for this plan will fail.
+    The queried value is cached for a short time (see
+    awp5.base.metacache), pass bypass_cache=True to query the P5 server in
+    any case.
     Return Values:
     -On Success:    the name of the archive index database. If none has
                     been set, the command returns the string  "<empty>"
     """
     method_name = "database"
-    return exec_nsdchat([module_name, archiveplan_name, method_name, value],
-                        p5_connection)
+    return _setting([module_name, archiveplan_name, method_name], value,
+                    p5_connection, bypass_cache)
 
 
-@onereturnvalue
-def deletefiles(archiveplan_name, value="", p5_connection=None):
+def deletefiles(archiveplan_name, value="", p5_connection=None,
+                bypass_cache=False):
     """
     Syntax: ArchivePlan <name> deletefiles [<value>]
     Description: Returns or sets the option to delete files after successfully
@@ -186,34 +240,39 @@ def deletefiles(archiveplan_name, value="", p5_connection=None):
     If optional <value> argument is omitted, returns the current setting.
     If <value> is given (as "true", "yes" or "1"), enables this option. To also
     delete the folder structure, use the deleteall command.
+    The queried value is cached for a short time (see
+    awp5.base.metacache), pass bypass_cache=True to query the P5 server in
+    any case.
     Return Values:
     -On Success:    the string "1" (the plan is set to delete files)
                     the string "0" (the plan is set not to delete files)
     """
     method_name = "deletefiles"
-    return exec_nsdchat([module_name, archiveplan_name, method_name, value],
-                        p5_connection)
+    return _setting([module_name, archiveplan_name, method_name], value,
+                    p5_connection, bypass_cache)
 
 
-@onereturnvalue
-def deleteall(archiveplan_name, value="", p5_connection=None):
+def deleteall(archiveplan_name, value="", p5_connection=None,
+              bypass_cache=False):
     """
     Syntax: ArchivePlan <name> deleteall [<value>]
     Description: Returns or sets the option to delete both files and folders
     after successfully completing archive plan job.
     If optional <value> argument is omitted, returns the current setting.
     If <value> is given (as "true", "yes" or "1"), enables this option.
+    The queried value is cached for a short time (see
+    awp5.base.metacache), pass bypass_cache=True to query the P5 server in
+    any case.
     Return Values:
     -On Success:    the string "1" (the plan is set to delete files and
                     folders)
                     the string "0" (the plan is set to not delete anything)
     """
     method_name = "deleteall"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return _setting([module_name, archiveplan_name, method_name], value,
+                    p5_connection, bypass_cache)
 
 
-@onereturnvalue
 def disable(archiveplan_name, p5_connection=None):
     """
     Syntax: ArchivePlan <name> disable
@@ -222,11 +281,10 @@ def disable(archiveplan_name, p5_connection=None):
     -On Success:    the string "0"
     """
     method_name = "disable"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return _change([module_name, archiveplan_name, method_name],
+                   p5_connection, unwrap)
 
 
-@onereturnvalue
 def enable(archiveplan_name, p5_connection=None):
     """
     Syntax: ArchivePlan <name> enable
@@ -235,12 +293,12 @@ def enable(archiveplan_name, p5_connection=None):
     -On Success:    the string "1"
     """
     method_name = "enable"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return _change([module_name, archiveplan_name, method_name],
+                   p5_connection, unwrap)
 
 
-@onereturnvalue
-def pool(archiveplan_name, value="", as_object=False, p5_connection=None):
+def pool(archiveplan_name, value="", as_object=False, p5_connection=None,
+         bypass_cache=False):
     """
     Syntax: ArchivePlan <name> pool [<value>]
     Description: Returns the name of the media pool associated with the archive
@@ -254,19 +312,19 @@ def pool(archiveplan_name, value="", as_object=False, p5_connection=None):
     to inspect and/or create media pools.
     Note that ArchivePlan must have the media pool set. Otherwise, the archive
     job configured to use this plan will fail.
+    The queried value is cached for a short time (see
+    awp5.base.metacache), pass bypass_cache=True to query the P5 server in
+    any case.
     Return Values:
     -On Success:    the name of the primary media pool. If not configured,
                     it returns the string "<empty>"
     """
     method_name = "pool"
-    result = exec_nsdchat([module_name, archiveplan_name, method_name, value],
-                          p5_connection)
-    if as_object:
-        result = resourcelist(result, Pool, p5_connection)
-    return result
+    return _setting([module_name, archiveplan_name, method_name], value,
+                    p5_connection, bypass_cache,
+                    _transform(as_object and _pool(), p5_connection))
 
 
-@onereturnvalue
 def run(archiveplan_name, delete=False, as_object=False, p5_connection=None):
     """
     Syntax: ArchivePlan <name> run [-delete 1]
@@ -277,19 +335,12 @@ def run(archiveplan_name, delete=False, as_object=False, p5_connection=None):
     Return Values:
     -On Success:    the archive job ID.
     """
-    delete_option = ""
-    if delete is True:
-        delete_option = "-delete -1"
     method_name = "run"
-    result = exec_nsdchat([module_name, archiveplan_name, method_name,
-                           delete_option], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, Job, p5_connection)
+    return _change((module_name, archiveplan_name, method_name) +
+                   _run_options[delete is True], p5_connection,
+                   _transform(as_object and _job(), p5_connection))
 
 
-@onereturnvalue
 def stop(archiveplan_name, p5_connection=None):
     """
     Syntax: ArchivePlan <name> stop
@@ -299,11 +350,10 @@ def stop(archiveplan_name, p5_connection=None):
                     the string "0" (the plan was not removed or is running)
     """
     method_name = "stop"
-    return exec_nsdchat([module_name, archiveplan_name, method_name],
-                        p5_connection)
+    return _change([module_name, archiveplan_name, method_name],
+                   p5_connection, unwrap)
 
 
-@onereturnvalue
 def submit(archiveplan_name, now=True, as_object=False, p5_connection=None):
     """
     Syntax: ArchivePlan <name> submit [<now>]
@@ -319,18 +369,11 @@ def submit(archiveplan_name, now=True, as_object=False, p5_connection=None):
     -On Success:    the archive job ID
     """
     method_name = "submit"
-    now_option = ""
-    if now is True:
-        now_option = "now"
-    result = exec_nsdchat([module_name, archiveplan_name, method_name,
-                           now_option], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, Job, p5_connection)
+    return _change((module_name, archiveplan_name, method_name) +
+                   _submit_options[now is True], p5_connection,
+                   _transform(as_object and _job(), p5_connection))
 
 
-@onereturnvalue
 def verify(archiveplan_name, client, job, p5_connection=None):
     """
     Syntax: ArchivePlan <name> verify <client> <job>
@@ -343,13 +386,119 @@ def verify(archiveplan_name, client, job, p5_connection=None):
                     resource description for more details
     """
     method_name = "verify"
-    return exec_nsdchat([module_name, archiveplan_name, method_name, client,
-                        job], p5_connection)
+    return submit_nsdchat([module_name, archiveplan_name, method_name, client,
+                           job], p5_connection, unwrap)
+
+
+_details = ("describe", "enabled", "disabled", "incrlevel", "autostart",
+            "database", "deletefiles", "deleteall", "pool")
+
+
+def _check_fields(fields):
+    for field in fields:
+        if field not in _details:
+            raise ValueError("{} is not a cached ArchivePlan query"
+                             "".format(field))
+
+
+def _create(cmd, as_object, prefetch, p5_connection):
+    # executes the create command 'cmd' and queries the 'prefetch' fields of
+    # the new plan in one batch, so they are cached; inside a Batch the new
+    # plan is not known yet and nothing is prefetched
+    _check_fields(prefetch)
+    transform = _transform(as_object and ArchivePlan, p5_connection)
+    if not prefetch or batch_for(p5_connection):
+        return submit_nsdchat(cmd, p5_connection, transform)
+    result = exec_nsdchat(cmd, p5_connection)
+    if result is None:
+        return None
+    plan = ArchivePlan(unwrap(result), p5_connection)
+    with Batch(p5_connection):
+        for field in prefetch:
+            getattr(plan, field)()
+    return transform(result)
+
+
+def list_details(fields=("describe", "enabled", "pool"), p5_connection=None):
+    """
+    Returns the list of ArchivePlan objects of all configured plans, with
+    the queries named in 'fields' already executed for all of them in one
+    batch. Their results are kept in the metadata cache (see
+    awp5.base.metacache), so e.g. plan.describe() on a returned plan does not
+    contact the P5 server again for a short time.
+    The 'fields' are names of the read-only queries describe, enabled,
+    disabled, incrlevel, autostart, database, deletefiles, deleteall and
+    pool.
+    """
+    _check_fields(fields)
+    plans = names(True, p5_connection)
+    with Batch(p5_connection):
+        for plan in plans:
+            for field in fields:
+                getattr(plan, field)()
+    return plans
+
+
+def list_with(field, p5_connection=None):
+    """
+    Returns a dict mapping the names of all configured archive plans to the
+    result of the read-only query 'field' (see list_details) for each plan.
+    The queries are executed in one batch and their results are cached.
+    """
+    _check_fields((field,))
+    plans = names(True, p5_connection)
+    with Batch(p5_connection):
+        futures = [(plan.name, getattr(plan, field)()) for plan in plans]
+    return {name: future.result() for name, future in futures}
+
+
+def list_descriptions(p5_connection=None):
+    """
+    Returns a dict mapping the names of all archive plans to their
+    descriptions, see list_with.
+    """
+    return list_with("describe", p5_connection)
+
+
+def list_enabled(p5_connection=None):
+    """
+    Returns a dict mapping the names of all archive plans to their enabled
+    status ("1" or "0"), see list_with.
+    """
+    return list_with("enabled", p5_connection)
 
 
 class ArchivePlan(P5Resource):
+    __slots__ = ('_argv_head',)
+
     def __init__(self, archiveplan_name, p5_connection=None):
         super().__init__(archiveplan_name, p5_connection)
+        self._argv_head = (module_name, self.name)
+
+    def _cmd(self, method_name, *args):
+        return self._argv_head + (method_name,) + args
+
+    async def _aquery(self, method_name, resource_class=None):
+        result = await async_query_nsdchat(self._cmd(method_name),
+                                           self.p5_connection)
+        if result is None:
+            return None
+        return _transform(resource_class, self.p5_connection)(result)
+
+    def batch(self):
+        """
+        Returns a Batch context manager. Inside its with block the methods of
+        this plan (and of other resources using its connection) return a
+        concurrent.futures.Future, and their commands are executed together
+        when the block is left. A Future can be passed on as argument, e.g.
+
+            with plan.batch():
+                description = plan.describe()
+                job = plan.submit(as_object=False)
+                verify = plan.verify("localhost", job)
+            print(description.result(), verify.result())
+        """
+        return Batch(self.p5_connection)
 
     def names(as_object=True, p5_connection=None):
         """
@@ -367,75 +516,85 @@ class ArchivePlan(P5Resource):
         else:
             return resourcelist(str_list, ArchivePlan, p5_connection)
 
-    @onereturnvalue
-    def describe(self):
+    def describe(self, bypass_cache=False):
         """
         Syntax: ArchivePlan <name> describe
         Description: Returns a human-readable description of the archive plan
         <name>.
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the plan description. If no description has been set
                         the command returns the string "<empty>"
         """
         method_name = "describe"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return metacache.submit_cached(self._cmd(method_name),
+                                       self.p5_connection, unwrap,
+                                       bypass_cache)
 
-    @onereturnvalue
-    def enabled(self):
+    def enabled(self, bypass_cache=False):
         """
         Syntax: ArchivePlan <name> enabled
         Description: Queries the plan Enabled status
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string "1" (plan is enabled) or "0" (not enabled)
         """
         method_name = "enabled"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return metacache.submit_cached(self._cmd(method_name),
+                                       self.p5_connection, unwrap,
+                                       bypass_cache)
 
-    @onereturnvalue
-    def disabled(self):
+    def disabled(self, bypass_cache=False):
         """
         Syntax: ArchivePlan <name> disabled
         Description: Queries the plan Disabled status
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string "1" (the plan is disabled) or "0" (not
         disabled)
         """
         method_name = "disabled"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return metacache.submit_cached(self._cmd(method_name),
+                                       self.p5_connection, unwrap,
+                                       bypass_cache)
 
-    @onereturnvalue
-    def incrlevel(self):
+    def incrlevel(self, bypass_cache=False):
         """
         Syntax: ArchivePlan <name> incrlevel
         Description: Queries the plan incremental status
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string "1" (plan is incremental)
                         or "0" (plan runs full)
         """
         method_name = "incrlevel"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return metacache.submit_cached(self._cmd(method_name),
+                                       self.p5_connection, unwrap,
+                                       bypass_cache)
 
-    @onereturnvalue
-    def autostart(self):
+    def autostart(self, bypass_cache=False):
         """
         Syntax: ArchivePlan <name> autostart
         Description: Returns the autostart setting for the Archive plan <name>.
         If the Archive plan is set to autostart, the returned value is "1",
         otherwise it is "0".
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string "1" (plan is set to autostart)
                         the string "0" (plan is not set to autostart)
         """
         method_name = "autostart"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return metacache.submit_cached(self._cmd(method_name),
+                                       self.p5_connection, unwrap,
+                                       bypass_cache)
 
-    @onereturnvalue
-    def create(description, as_object=True, p5_connection=None):
+    def create(description, as_object=True, p5_connection=None,
+               prefetch=()):
         """
         Syntax: ArchivePlan create <description>
         Description: Creates a new archive plan with the given <description>.
@@ -445,17 +604,16 @@ class ArchivePlan(P5Resource):
         using the database, pool and/or copypool methods described below.
         If not further configured, the newly generated plan will per-default
         use the Default-Archive pool and the Default-Archive database.
+        The read-only queries named in 'prefetch' (see list_details) are
+        executed for the new plan right away in one batch, so the usual
+        follow-up queries are answered from the metadata cache.
         Return Values:
         -On Success:    the name of the newly created plan
         """
         method_name = "create"
-        result = exec_nsdchat([module_name, method_name, description],
-                              p5_connection)
-        if as_object:
-            result = resourcelist(result, ArchivePlan, p5_connection)
-        return result
+        return _create([module_name, method_name, description], as_object,
+                       prefetch, p5_connection)
 
-    @onereturnvalue
     def cancel(self):
         """
         Syntax: ArchivePlan <name> cancel
@@ -468,11 +626,10 @@ class ArchivePlan(P5Resource):
                         running)
         """
         method_name = "cancel"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _change(self._cmd(method_name),
+                       self.p5_connection, unwrap)
 
-    @onereturnvalue
-    def database(self, value=""):
+    def database(self, value="", bypass_cache=False):
         """
         Syntax: ArchivePlan <name> database [<value>]
         Description: Returns or sets the name of the index database resource
@@ -488,16 +645,18 @@ class ArchivePlan(P5Resource):
         and/or create archive index databases.
         Note that ArchivePlan requires that a database is set. Otherwise, the
         archive job for this plan will fail.
+        The queried value is cached for a short time (see
+        awp5.base.metacache), pass bypass_cache=True to query the P5 server in
+        any case.
         Return Values:
         -On Success:    the name of the archive index database. If none has
                         been set, the command returns the string  "<empty>"
         """
         method_name = "database"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, value])
+        return _setting(self._cmd(method_name), value, self.p5_connection,
+                        bypass_cache)
 
-    @onereturnvalue
-    def deletefiles(self, value=""):
+    def deletefiles(self, value="", bypass_cache=False):
         """
         Syntax: ArchivePlan <name> deletefiles [<value>]
         Description: Returns or sets the option to delete files after
@@ -505,32 +664,36 @@ class ArchivePlan(P5Resource):
         If optional <value> argument is omitted, returns the current setting.
         If <value> is given (as "true", "yes" or "1"), enables this option. To
         also delete the folder structure, use the deleteall command.
+        The queried value is cached for a short time (see
+        awp5.base.metacache), pass bypass_cache=True to query the P5 server in
+        any case.
         Return Values:
         -On Success:    the string "1" (the plan is set to delete files)
                         the string "0" (the plan is set not to delete files)
         """
         method_name = "deletefiles"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, value])
+        return _setting(self._cmd(method_name), value, self.p5_connection,
+                        bypass_cache)
 
-    @onereturnvalue
-    def deleteall(self, value=""):
+    def deleteall(self, value="", bypass_cache=False):
         """
         Syntax: ArchivePlan <name> deleteall [<value>]
         Description: Returns or sets the option to delete both files and
         folders after successfully completing archive plan job.
         If optional <value> argument is omitted, returns the current setting.
         If <value> is given (as "true", "yes" or "1"), enables this option.
+        The queried value is cached for a short time (see
+        awp5.base.metacache), pass bypass_cache=True to query the P5 server in
+        any case.
         Return Values:
         -On Success:    the string "1" (the plan is set to delete files and
                         folders)
                         the string "0" (the plan is set to not delete anything)
         """
         method_name = "deleteall"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _setting(self._cmd(method_name), value, self.p5_connection,
+                        bypass_cache)
 
-    @onereturnvalue
     def disable(self):
         """
         Syntax: ArchivePlan <name> disable
@@ -539,10 +702,9 @@ class ArchivePlan(P5Resource):
         -On Success:    the string "0"
         """
         method_name = "disable"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _change(self._cmd(method_name),
+                       self.p5_connection, unwrap)
 
-    @onereturnvalue
     def enable(self):
         """
         Syntax: ArchivePlan <name> enable
@@ -551,11 +713,10 @@ class ArchivePlan(P5Resource):
         -On Success:    the string "1"
         """
         method_name = "enable"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _change(self._cmd(method_name),
+                       self.p5_connection, unwrap)
 
-    @onereturnvalue
-    def pool(self, value="", as_object=False):
+    def pool(self, value="", as_object=False, bypass_cache=False):
         """
         Syntax: ArchivePlan <name> pool [<value>]
         Description: Returns the name of the media pool associated with the
@@ -569,18 +730,18 @@ class ArchivePlan(P5Resource):
         resource commands to inspect and/or create media pools.
         Note that ArchivePlan must have the media pool set. Otherwise, the
         archive job configured to use this plan will fail.
+        The queried value is cached for a short time (see
+        awp5.base.metacache), pass bypass_cache=True to query the P5 server in
+        any case.
         Return Values:
         -On Success:    the name of the primary media pool. If not configured,
                         it returns the string "<empty>"
         """
         method_name = "pool"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, value])
-        if as_object:
-            result = resourcelist(result, Pool, self.p5_connection)
-        return result
+        return _setting(self._cmd(method_name), value, self.p5_connection,
+                        bypass_cache,
+                        _transform(as_object and _pool(), self.p5_connection))
 
-    @onereturnvalue
     def run(self, delete=False, as_object=True):
         """
         Syntax: ArchivePlan <name> run [-delete 1]
@@ -592,18 +753,13 @@ class ArchivePlan(P5Resource):
         Return Values:
         -On Success:    the archive job ID.
         """
-        delete_option = ""
-        if delete is True:
-            delete_option = "-delete -1"
         method_name = "run"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, delete_option])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, Job, self.p5_connection)
+        return _change(self._cmd(method_name,
+                                 *_run_options[delete is True]),
+                       self.p5_connection,
+                       _transform(as_object and _job(),
+                                  self.p5_connection))
 
-    @onereturnvalue
     def stop(self):
         """
         Syntax: ArchivePlan <name> stop
@@ -613,10 +769,9 @@ class ArchivePlan(P5Resource):
                         the string "0" (the plan was not removed or is running)
         """
         method_name = "stop"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _change(self._cmd(method_name),
+                       self.p5_connection, unwrap)
 
-    @onereturnvalue
     def submit(self, now=True, as_object=True):
         """
         Syntax: ArchivePlan <name> submit [<now>]
@@ -633,17 +788,12 @@ class ArchivePlan(P5Resource):
         -On Success:    the archive job ID
         """
         method_name = "submit"
-        now_option = ""
-        if now is True:
-            now_option = "now"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, now_option])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, Job, self.p5_connection)
+        return _change(self._cmd(method_name,
+                                 *_submit_options[now is True]),
+                       self.p5_connection,
+                       _transform(as_object and _job(),
+                                  self.p5_connection))
 
-    @onereturnvalue
     def verify(self, client, job):
         """
         Syntax: ArchivePlan <name> verify <client> <job>
@@ -656,8 +806,52 @@ class ArchivePlan(P5Resource):
                         resource description for more details
         """
         method_name = "verify"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, client, job])
+        return submit_nsdchat(self._cmd(method_name, client, job),
+                              self.p5_connection, unwrap)
+
+    async def adescribe(self):
+        """
+        Coroutine variant of describe. The async variants of the queries let
+        many plans be queried at once, e.g.
+            await asyncio.gather(*[plan.adescribe() for plan in plans])
+        """
+        return await self._aquery("describe")
+
+    async def aenabled(self):
+        """
+        Coroutine variant of enabled.
+        """
+        return await self._aquery("enabled")
+
+    async def adisabled(self):
+        """
+        Coroutine variant of disabled.
+        """
+        return await self._aquery("disabled")
+
+    async def aincrlevel(self):
+        """
+        Coroutine variant of incrlevel.
+        """
+        return await self._aquery("incrlevel")
+
+    async def aautostart(self):
+        """
+        Coroutine variant of autostart.
+        """
+        return await self._aquery("autostart")
+
+    async def adatabase(self):
+        """
+        Coroutine variant of database, querying the configured database.
+        """
+        return await self._aquery("database")
+
+    async def apool(self, as_object=False):
+        """
+        Coroutine variant of pool, querying the configured pool.
+        """
+        return await self._aquery("pool", as_object and _pool())
 
     def __repr__(self):
         return ": ".join([__class__.__name__, self.name])
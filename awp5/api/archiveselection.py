@@ -24,15 +24,83 @@ fill-in the selection with files and/or directories to archive. Finally, submit
 the selection for immediate or scheduled execution. After submission, the
 resource goes out of scope and should not be used any more.
 """
-from awp5.base.connection import P5Resource, exec_nsdchat
-from awp5.base.helpers import resourcelist, onereturnvalue
-from awp5.api.archiveentry import ArchiveEntry
-from awp5.api.archiveplan import ArchivePlan
-from awp5.api.job import Job
+import json
+import os
+from concurrent.futures import Future
+from itertools import chain
+from awp5.base import metacache, statcache
+from awp5.base.connection import P5Resource, Batch, exec_nsdchat
+from awp5.base.connection import exec_nsdchat_batch, submit_nsdchat
+from awp5.base.helpers import resourcelist, onereturnvalue, singlevalue
+from awp5.base.helpers import bracequote, resource, unwrap
 
 module_name = "ArchiveSelection"
 
 
+# the kinds of add methods add_entries can run
+_add_kinds = ("entry", "file", "directory")
+# the <now> values submit accepts as "run now"
+_now_values = frozenset((True, "1", "t", "true", "True", "y", "yes", "Yes"))
+
+
+def _entry():
+    # ArchiveEntry and Job objects are only built for as_object=True, so
+    # their modules are imported on first use instead of with this one
+    from awp5.api.archiveentry import ArchiveEntry
+    return ArchiveEntry
+
+
+def _job():
+    from awp5.api.job import Job
+    return Job
+
+
+def _transform(resource_class, p5_connection):
+    # the add methods return the unwrapped result, or the ArchiveEntry object
+    # named by it; applied by submit_nsdchat, so inside a pipeline the Futures
+    # resolve to the same value
+    if not resource_class:
+        return unwrap
+    return lambda result: resource(result, resource_class, p5_connection)
+
+
+cache_ttl = 0.5
+"""
+The number of seconds the results of the queries describe, level, entries
+and size are cached (see awp5.base.metacache). The adding methods, submit
+and destroy drop the cached results of their selection at once.
+"""
+
+
+def _query(cmd, p5_connection, bypass_cache):
+    return metacache.submit_cached(cmd, p5_connection, unwrap, bypass_cache,
+                                   cache_ttl, bound=True)
+
+
+def _size(archiveselection_name, p5_connection, bypass_cache):
+    # entries and size return the same number, both query it with the size
+    # command known to all P5 versions and so share one cached result
+    return _query([module_name, archiveselection_name, "size"],
+                  p5_connection, bypass_cache)
+
+
+def _change(cmd, p5_connection, transform=unwrap):
+    # submits 'cmd', which changes the selection cmd[:2] names, so its
+    # cached queries are dropped once it has completed; like every command
+    # on a selection it is bound to the session of 'p5_connection', the
+    # only one that knows the temporary selection (see connection.hold)
+    return submit_nsdchat(cmd, p5_connection,
+                          metacache.invalidating(cmd[:2], p5_connection,
+                                                 transform), bound=True)
+
+
+def _setting(cmd, value, p5_connection, bypass_cache):
+    # 'cmd' queries the setting, with 'value' appended it sets it
+    if value:
+        return _change(tuple(cmd) + (value,), p5_connection)
+    return _query(cmd, p5_connection, bypass_cache)
+
+
 @onereturnvalue
 def create(client, plan, indexroot=None, as_object=False,
            p5_connection=None):
@@ -55,14 +123,13 @@ def create(client, plan, indexroot=None, as_object=False,
     """
     method_name = "create"
     result = exec_nsdchat([module_name, method_name, client, plan, indexroot],
-                          p5_connection)
+                          p5_connection, bound=True)
     if not as_object:
         return result
     else:
         return resourcelist(result, ArchiveSelection, p5_connection)
 
 
-@onereturnvalue
 def addfrom(archiveselection_name, inputfile, outputfile, p5_connection=None):
     """
     Syntax: ArchiveSelection <name> addfrom <input file> <output file>
@@ -90,11 +157,82 @@ def addfrom(archiveselection_name, inputfile, outputfile, p5_connection=None):
     -On Success:    the number of added key/value pairs
     """
     method_name = "addfrom"
-    return exec_nsdchat([module_name, archiveselection_name, method_name,
-                         inputfile, outputfile], p5_connection)
+    return _change([module_name, archiveselection_name, method_name,
+                    inputfile, outputfile], p5_connection)
+
+
+def _key_values(key_value_list):
+    # the <key> <value> arguments of the add methods, given as list of keys
+    # and values or as dict
+    if isinstance(key_value_list, dict):
+        return tuple(chain.from_iterable(key_value_list.items()))
+    return key_value_list
+
+
+def _add(argv_head, method_name, path, key_value_list, as_object,
+         p5_connection):
+    # the common part of the addentry, addfile and adddirectory methods and
+    # their abs variants, which only differ in the nsdchat method called;
+    # 'argv_head' is the (module_name, <name>) tuple of the selection,
+    # whose cached queries are dropped once the entry has been added
+    return _change(argv_head + (method_name, path,
+                                _key_values(key_value_list)),
+                   p5_connection,
+                   _transform(as_object and _entry(), p5_connection))
+
+
+def _write_entries(inputfile, entries):
+    # writes 'entries' (paths or (path, key_value_list) pairs) in the addfrom
+    # <input file> format
+    with open(inputfile, "w", encoding="utf-8") as output:
+        output.writelines(
+            (entry if isinstance(entry, str) else
+             "\t".join(map(str, (entry[0],) +
+                                tuple(_key_values(entry[1]) or ()))))
+            + "\n"
+            for entry in entries)
+
+
+def _read_handles(outputfile):
+    # the (path, handle) records of an addfrom <output file>; the handle is
+    # split off at the last TAB, so a path containing TABs stays intact
+    rows = []
+    with open(outputfile, encoding="utf-8", errors="replace") as output:
+        for line in output:
+            path, sep, handle = line.rstrip("\n").rpartition("\t")
+            if sep:
+                rows.append((path, handle))
+    return rows
+
+
+def addfrom_iter(archiveselection_name, entries, inputfile, outputfile,
+                 as_object=False, p5_connection=None):
+    """
+    Adds all 'entries' to the archive selection <name> with a single addfrom
+    call instead of one addentry call each. Each entry is either a path or a
+    (path, key_value_list) pair, see addentry. The entries are written to the
+    local file 'inputfile', so the selection must be created for a client
+    which can read it under the same path (usually the P5 server itself),
+    and 'outputfile' must be readable by this process in the same way.
+    Return Values:
+    -On Success:    the list of (path, ArchiveEntry name) tuples of the
+                    accepted files, with ArchiveEntry objects if 'as_object'
+                    is set
+    """
+    _write_entries(inputfile, entries)
+    result = exec_nsdchat([module_name, archiveselection_name, "addfrom",
+                           inputfile, outputfile], p5_connection, bound=True)
+    metacache.invalidate([module_name, archiveselection_name], p5_connection)
+    if result is None:
+        return None
+    rows = _read_handles(outputfile)
+    if not as_object:
+        return rows
+    entry_class = _entry()
+    return [(path, entry_class(handle, p5_connection))
+            for path, handle in rows]
 
 
-@onereturnvalue
 def addentry(archiveselection_name, path, key_value_list=None, as_object=False,
              p5_connection=None):
     """
@@ -109,10 +247,12 @@ def addentry(archiveselection_name, path, key_value_list=None, as_object=False,
     create. If the passed <path> contains blanks, be sure to enclose it in
     curly braces: {/some/path with blanks/file}. Furthermore, if the <path>
     contains { and/or } chars themselves, you must escape them with a backslash
-    '\' character.
+    '\' character. awp5.base.helpers.bracequote(path) does both.
     To each path, you can assign an arbitrary number of <key> and <value>
     pairs. Those are saved in the archive index and can be used for searches
     during restore (see RestoreSelection).
+    The <key> <value> pairs are given as 'key_value_list', either as list
+    of keys and values or as dict.
     Each key allows a string value of unlimited length. If the value contains
     blanks, it should be enclosed in curly braces. If the value itself contains
     curly braces, you must escape them with '\' character.
@@ -128,15 +268,10 @@ def addentry(archiveselection_name, path, key_value_list=None, as_object=False,
                     Please see the ArchiveEntry resource description
     """
     method_name = "addentry"
-    result = exec_nsdchat([module_name, archiveselection_name, method_name,
-                           path, key_value_list], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, ArchiveEntry, p5_connection)
+    return _add((module_name, archiveselection_name), method_name, path,
+                key_value_list, as_object, p5_connection)
 
 
-@onereturnvalue
 def addentryabs(archiveselection_name, path, key_value_list=None,
                 as_object=False, p5_connection=None):
     """
@@ -151,7 +286,7 @@ def addentryabs(archiveselection_name, path, key_value_list=None,
     blanks, be sure to enclose it in curly braces:
     {/some/path with blanks/file}. Furthermore, if the <path> contains
     { and/or } chars themselves, you must escape them with a backslash '\'
-    character.
+    character. awp5.base.helpers.bracequote(path) does both.
     To each path, you can assign an arbitrary number of <key> and <value>
     pairs. Those are saved in the archive index and can be used for searches
     during restore (see RestoreSelection).
@@ -166,15 +301,10 @@ def addentryabs(archiveselection_name, path, key_value_list=None,
                     Please see the ArchiveEntry resource description
     """
     method_name = "addentryabs"
-    result = exec_nsdchat([module_name, archiveselection_name, method_name,
-                           path, key_value_list], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, ArchiveEntry, p5_connection)
+    return _add((module_name, archiveselection_name), method_name, path,
+                key_value_list, as_object, p5_connection)
 
 
-@onereturnvalue
 def adddirectory(archiveselection_name, path, key_value_list=None,
                  as_object=False, p5_connection=None):
     """
@@ -197,15 +327,10 @@ def adddirectory(archiveselection_name, path, key_value_list=None,
     -On Success:    see the addentry description for return values
     """
     method_name = "adddirectory"
-    result = exec_nsdchat([module_name, archiveselection_name, method_name,
-                           path, key_value_list], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, ArchiveEntry, p5_connection)
+    return _add((module_name, archiveselection_name), method_name, path,
+                key_value_list, as_object, p5_connection)
 
 
-@onereturnvalue
 def adddirectoryabs(archiveselection_name, path, key_value_list=None,
                     as_object=False, p5_connection=None):
     """
@@ -227,15 +352,10 @@ def adddirectoryabs(archiveselection_name, path, key_value_list=None,
     -On Success:    see the addentry method for return values
     """
     method_name = "adddirectoryabs"
-    result = exec_nsdchat([module_name, archiveselection_name, method_name,
-                           path, key_value_list], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, ArchiveEntry, p5_connection)
+    return _add((module_name, archiveselection_name), method_name, path,
+                key_value_list, as_object, p5_connection)
 
 
-@onereturnvalue
 def addfile(archiveselection_name, path, key_value_list=None,
             as_object=False, p5_connection=None):
     """
@@ -254,15 +374,10 @@ def addfile(archiveselection_name, path, key_value_list=None,
     -On Success:    see the addentry method for return values
     """
     method_name = "addfile"
-    result = exec_nsdchat([module_name, archiveselection_name, method_name,
-                           path, key_value_list], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, ArchiveEntry, p5_connection)
+    return _add((module_name, archiveselection_name), method_name, path,
+                key_value_list, as_object, p5_connection)
 
 
-@onereturnvalue
 def addfileabs(archiveselection_name, path, key_value_list=None,
                as_object=False, p5_connection=None):
     """
@@ -280,30 +395,222 @@ def addfileabs(archiveselection_name, path, key_value_list=None,
     -On Success:    see the addentry method for return values
     """
     method_name = "addfileabs"
-    result = exec_nsdchat([module_name, archiveselection_name, method_name,
-                           path, key_value_list], p5_connection)
+    return _add((module_name, archiveselection_name), method_name, path,
+                key_value_list, as_object, p5_connection)
+
+
+def add_entries(archiveselection_name, entries, absolute=False,
+                as_object=False, p5_connection=None, kind="entry"):
+    """
+    Adds all 'entries' to the archive selection <name> with addentry (or
+    addentryabs if 'absolute' is set), running the nsdchat calls as one
+    batch. Like all commands on the selection they run one after another on
+    the session which created it (see _change). Each entry is either a path
+    or a (path, key_value_list) pair, see the addentry method for both.
+    With 'kind' set to "file" or "directory" the entries are added with
+    addfile or adddirectory (or their abs variants) instead.
+    Return Values:
+    -On Success:    the list of the ArchiveEntry names (or objects if
+                    'as_object' is set) in the order of 'entries'. An entry
+                    that was not added is "<empty>" (None with 'as_object'),
+                    a failed one is None
+    """
+    return _added(_add_batch(archiveselection_name, entries, absolute, kind,
+                             p5_connection), as_object, p5_connection)
+
+
+def _add_batch(archiveselection_name, entries, absolute, kind,
+               p5_connection):
+    # runs the add commands of add_entries and returns their raw results
+    if kind not in _add_kinds:
+        raise ValueError("{} is not one of {}".format(kind, _add_kinds))
+    method_name = "add" + kind + ("abs" if absolute else "")
+    argv_head = (module_name, archiveselection_name, method_name)
+    cmds = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = (entry, None)
+        cmds.append(argv_head + (entry[0], _key_values(entry[1])))
+    results = exec_nsdchat_batch(cmds, p5_connection, bound=True)
+    metacache.invalidate(argv_head[:2], p5_connection)
+    return results
+
+
+def _added(batch_results, as_object, p5_connection):
+    # the add_entries return value from the results of the add commands
+    results = [None if result is None else singlevalue(result)
+               for result in batch_results]
     if not as_object:
-        return result
-    else:
-        return resourcelist(result, ArchiveEntry, p5_connection)
+        return results
+    entry_class = _entry()
+    return [entry_class(result, p5_connection)
+            if result and result != "<empty>" else None
+            for result in results]
 
 
-@onereturnvalue
-def describe(archiveselection_name, title=None, p5_connection=None):
+def _adds_anything(result):
+    # whether the result of an add method (or of add_entries, add_tree,
+    # add_delta and addfrom_iter) names an added entry; a batched add is
+    # counted, its result is not known yet when submit asks
+    if isinstance(result, Future):
+        return True
+    if isinstance(result, list):
+        return any(map(_adds_anything, result))
+    if isinstance(result, tuple):
+        return _adds_anything(result[1])
+    return bool(result) and result != "<empty>"
+
+
+def _scan(root, prune, include):
+    # yields (path, is_directory) for the directories below 'root' not
+    # rejected by 'prune' and the other entries accepted by 'include'; the
+    # types come from the directory listing, so no entry is stat'ed
+    with os.scandir(root) as listing:
+        for entry in listing:
+            if entry.is_dir(follow_symlinks=False):
+                if prune and prune(entry.path):
+                    continue
+                yield entry.path, True
+                yield from _scan(entry.path, prune, include)
+            elif not include or include(entry.path):
+                yield entry.path, False
+
+
+def add_tree(archiveselection_name, root, key_value_list=None, prune=None,
+             include=None, absolute=False, as_object=False,
+             p5_connection=None):
+    """
+    Adds the directory 'root' and its contents recursively to the archive
+    selection <name>. Without 'prune' and 'include' this is a single addentry
+    call and the P5 server enumerates the tree itself.
+    'prune' and 'include' are called with the path of each directory
+    respectively other entry below 'root'; directories for which 'prune'
+    returns true are skipped with their contents, other entries are only
+    added if 'include' returns true. The tree is then enumerated locally, so
+    the selection must be created for a client which sees it under the same
+    path, and each directory node is added with adddirectory and each other
+    entry with addfile (or their abs variants if 'absolute' is set), all run
+    as one batch. 'key_value_list' is assigned to every added entry.
+    'root' is the plain local path; it and the paths found below it are
+    quoted with bracequote for nsdchat.
+    Return Values:
+    -On Success:    the list of the ArchiveEntry names (or objects if
+                    'as_object' is set), see add_entries
+    """
+    if not prune and not include:
+        return add_entries(archiveselection_name,
+                           [(bracequote(root), key_value_list)], absolute,
+                           as_object, p5_connection)
+    suffix = "abs" if absolute else ""
+    key_values = _key_values(key_value_list)
+    cmds = [[module_name, archiveselection_name, "adddirectory" + suffix,
+             bracequote(root), key_values]]
+    for path, is_directory in _scan(root, prune, include):
+        method_name = "adddirectory" if is_directory else "addfile"
+        cmds.append([module_name, archiveselection_name, method_name + suffix,
+                     bracequote(path), key_values])
+    results = exec_nsdchat_batch(cmds, p5_connection, bound=True)
+    metacache.invalidate([module_name, archiveselection_name], p5_connection)
+    return _added(results, as_object, p5_connection)
+
+
+def _load_state(statefile):
+    # the add_delta state: the signatures of the paths of the last submitted
+    # selection filled from it and the job id of that submit, and the
+    # signatures staged by add_delta since
+    try:
+        with open(statefile, encoding="utf-8") as state_input:
+            state = json.load(state_input)
+    except FileNotFoundError:
+        state = {"paths": {}, "job": None}
+    state.setdefault("staged", None)
+    return state
+
+
+def _save_state(statefile, paths, job, staged=None):
+    with open(statefile, "w", encoding="utf-8") as state_output:
+        json.dump({"paths": paths, "job": job, "staged": staged},
+                  state_output)
+
+
+def _recording(statefile, transform):
+    # wraps the transform of submit to record the staged signatures and the
+    # job id in 'statefile', which only happens if the submit succeeded
+    def record(result):
+        saved = _load_state(statefile)
+        paths = saved["paths"] if saved["staged"] is None else \
+            saved["staged"]
+        _save_state(statefile, paths, singlevalue(result))
+        return transform(result)
+    return record
+
+
+def _signature(path):
+    # what add_delta compares to tell whether <path> changed
+    stat = statcache.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def add_delta(archiveselection_name, paths, statefile, key_value_list=None,
+              absolute=False, as_object=False, p5_connection=None):
+    """
+    Adds those of 'paths' to the archive selection <name> which are new or
+    changed (by modification time or size) since the last add_delta call
+    with the same 'statefile', as one batch like add_entries. The paths are
+    stat'ed locally, so the selection must be created for a client which
+    sees them under the same path. They are given plain and quoted with
+    bracequote for nsdchat. 'statefile' is a local JSON file keeping the
+    state of the paths of the last submitted selection filled from it (and
+    the job ID of that submit). The new state is only staged in it and
+    recorded once the selection has been submitted with the same
+    'statefile' (see submit and ArchiveSelection.submit), so the paths of a
+    selection never (or not successfully) submitted are added again by the
+    next call. Paths no longer given are dropped from the state, a path
+    whose add failed is retried by the next call.
+    Return Values:
+    -On Success:    the list of (path, ArchiveEntry name) tuples of the
+                    paths added, with ArchiveEntry objects if 'as_object'
+                    is set, see add_entries
+    """
+    saved = _load_state(statefile)
+    previous = saved["paths"]
+    state = {}
+    changed = []
+    for path in paths:
+        state[path] = _signature(path)
+        if previous.get(path) != state[path]:
+            changed.append(path)
+    # whether an add failed is told by its raw result: with 'as_object' a
+    # path that was not added ("<empty>") would be None as well
+    batch_results = _add_batch(archiveselection_name,
+                               [(bracequote(path), key_value_list)
+                                for path in changed],
+                               absolute, "entry", p5_connection)
+    for path, result in zip(changed, batch_results):
+        if result is None:
+            state[path] = previous.get(path)
+    _save_state(statefile, previous, saved["job"], state)
+    return list(zip(changed, _added(batch_results, as_object,
+                                    p5_connection)))
+
+
+def describe(archiveselection_name, title=None, p5_connection=None,
+             bypass_cache=False):
     """
     Syntax: ArchiveSelection <name> describe [title]
     Description: If a title is given, the title is set as the description in
     the job monitor.
     The method returns the current description
+    The queried value is cached for a short time (see cache_ttl), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the descriptions string as used in the job monitor
     """
     method_name = "describe"
-    return exec_nsdchat([module_name, archiveselection_name, method_name,
-                         title], p5_connection)
+    return _setting([module_name, archiveselection_name, method_name], title,
+                    p5_connection, bypass_cache)
 
 
-@onereturnvalue
 def destroy(archiveselection_name, p5_connection=None):
     """
     Syntax: ArchiveSelection <name> destroy
@@ -314,55 +621,54 @@ def destroy(archiveselection_name, p5_connection=None):
                     the string "1" (not destroyed)
     """
     method_name = "destroy"
-    return exec_nsdchat([module_name, archiveselection_name, method_name],
-                        p5_connection)
+    return _change([module_name, archiveselection_name, method_name],
+                   p5_connection)
 
 
-@onereturnvalue
-def entries(archiveselection_name, p5_connection=None):
+def entries(archiveselection_name, p5_connection=None, bypass_cache=False):
     """
-    Syntax: ArchiveSelection <name> entires
+    Syntax: ArchiveSelection <name> entries
     Description: Returns the number of entries in the selection object.
+    The result is cached for a short time (see cache_ttl), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the number of entries
     """
-    method_name = "size"
-    return exec_nsdchat([module_name, archiveselection_name, method_name],
-                        p5_connection)
+    return _size(archiveselection_name, p5_connection, bypass_cache)
 
 
-@onereturnvalue
-def level(archiveselection_name, level_value=None, p5_connection=None):
+def level(archiveselection_name, level_value=None, p5_connection=None,
+          bypass_cache=False):
     """
     Syntax: ArchiveSelection <name> [level]
     Description: Returns the level of the ArchiveSelection.
     If the optional level value is given, that level is set.
     The level must be either “full” or “increment”.
+    The queried value is cached for a short time (see cache_ttl), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string “full” or “increment”
     """
     method_name = "level"
-    return exec_nsdchat([module_name, archiveselection_name, method_name,
-                         level_value], p5_connection)
+    return _setting([module_name, archiveselection_name, method_name],
+                    level_value, p5_connection, bypass_cache)
 
 
-@onereturnvalue
-def size(archiveselection_name, p5_connection=None):
+def size(archiveselection_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: ArchiveSelection <name> size
     Description: Returns the number of entries in the selection object.
     This method is deprecated, please use ArchiveSelection entries instead.
+    The result is cached for a short time (see cache_ttl), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the number of entries
     """
-    method_name = "size"
-    return exec_nsdchat([module_name, archiveselection_name, method_name],
-                        p5_connection)
+    return _size(archiveselection_name, p5_connection, bypass_cache)
 
 
-@onereturnvalue
 def submit(archiveselection_name, now=True, as_object=False,
-           p5_connection=None):
+           p5_connection=None, statefile=None):
     """
     Syntax: ArchiveSelection <name> submit [<now>]
     Description: Submits the archive selection for execution. You can
@@ -371,24 +677,24 @@ def submit(archiveselection_name, now=True, as_object=False,
     This command implicitly destroys the ArchiveSelection object for the user
     and transfers the ownership of the internal underlying object to the job
     scheduler. You should not attempt to use the <name> afterwards.
+    If the selection was filled with add_delta, pass its 'statefile' to
+    record the staged state of the added paths and the job ID once the
+    submit succeeded.
     Return Values:
     -On Success:    the archive job ID. Use this job ID to query the
                     status of the job by using Job resource.
                     Please see the Job resource description for details.
     """
     method_name = "submit"
-    now_option = ""
-    if now is True:
-        now_option = "1"
-    result = exec_nsdchat([module_name, archiveselection_name, method_name,
-                           now_option], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, Job, p5_connection)
+    now_option = "1" if now in _now_values else None
+    transform = _transform(as_object and _job(), p5_connection)
+    if statefile:
+        transform = _recording(statefile, transform)
+    statcache.invalidate()
+    return _change([module_name, archiveselection_name, method_name,
+                    now_option], p5_connection, transform)
 
 
-@onereturnvalue
 def onjobactivation(archiveselection_name, p5_connection=None, command=None):
     """
     Syntax: ArchiveSelection <name> onjobactivation <command>]
@@ -414,11 +720,10 @@ def onjobactivation(archiveselection_name, p5_connection=None, command=None):
     -On Success:    the command string
     """
     method_name = "onjobactivation"
-    return exec_nsdchat([module_name, archiveselection_name, method_name,
-                         command], p5_connection)
+    return submit_nsdchat([module_name, archiveselection_name, method_name,
+                           command], p5_connection, unwrap, bound=True)
 
 
-@onereturnvalue
 def onjobcompletion(archiveselection_name, p5_connection=None, command=None):
     """
     Syntax: ArchiveSelection <name> onjobcompletion <command>
@@ -429,11 +734,10 @@ def onjobcompletion(archiveselection_name, p5_connection=None, command=None):
     -On Success:    the command string
     """
     method_name = "onjobcompletion"
-    return exec_nsdchat([module_name, archiveselection_name, method_name,
-                         command], p5_connection)
+    return submit_nsdchat([module_name, archiveselection_name, method_name,
+                           command], p5_connection, unwrap, bound=True)
 
 
-@onereturnvalue
 def onfiledeletion(archiveselection_name, p5_connection=None, command=None):
     """
     Syntax: ArchiveSelection <name> onfiledeletion <command>
@@ -444,13 +748,34 @@ def onfiledeletion(archiveselection_name, p5_connection=None, command=None):
     -On Success:    the command string
     """
     method_name = "onfiledeletion"
-    return exec_nsdchat([module_name, archiveselection_name, method_name,
-                         command], p5_connection)
+    return submit_nsdchat([module_name, archiveselection_name, method_name,
+                           command], p5_connection, unwrap, bound=True)
 
 
 class ArchiveSelection(P5Resource):
+    __slots__ = ('_argv_head', '_pending_paths', '_pending_kvs', '_statefile',
+                 '_filled')
+
     def __init__(self, archiveselection_name, p5_connection=None):
         super().__init__(archiveselection_name, p5_connection)
+        self._argv_head = (module_name, self.name)
+        # entries buffered by buffer_entry, kept as one list of paths and
+        # one of their key/value lists
+        self._pending_paths = []
+        self._pending_kvs = []
+        # the statefile of the last add_delta call and whether any add
+        # method added an entry, see submit
+        self._statefile = None
+        self._filled = False
+
+    def _cmd(self, method_name, *args):
+        return self._argv_head + (method_name,) + args
+
+    def _record(self, result):
+        # notes whether the add call returning 'result' added anything
+        if not self._filled:
+            self._filled = _adds_anything(result)
+        return result
 
     @onereturnvalue
     def create(client, plan, indexroot=None, as_object=True, p5_connection=None):
@@ -473,13 +798,12 @@ class ArchiveSelection(P5Resource):
         """
         method_name = "create"
         result = exec_nsdchat([module_name, method_name, client, plan,
-                               indexroot], p5_connection)
+                               indexroot], p5_connection, bound=True)
         if not as_object:
             return result
         else:
             return resourcelist(result, ArchiveSelection, p5_connection)
 
-    @onereturnvalue
     def addfrom(self, inputfile, outputfile):
         """
         Syntax: ArchiveSelection <name> addfrom <input file> <output file>
@@ -507,11 +831,32 @@ class ArchiveSelection(P5Resource):
         -On Success:    the number of added key/value pairs
         """
         method_name = "addfrom"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, inputfile,
-                                                outputfile])
+        result = _change(self._cmd(method_name, inputfile, outputfile),
+                         self.p5_connection)
+        # the number of key/value pairs does not tell whether entries were
+        # added, so any successful call counts
+        if result is not None:
+            self._filled = True
+        return result
+
+    def addfrom_iter(self, entries, inputfile, outputfile, as_object=True):
+        """
+        Adds all 'entries' to the archive selection with a single addfrom
+        call instead of one addentry call each. Each entry is either a path or
+        a (path, key_value_list) pair, see addentry. The entries are written
+        to the local file 'inputfile', so the selection must be created for a
+        client which can read it under the same path (usually the P5 server
+        itself), and 'outputfile' must be readable by this process in the
+        same way.
+        Return Values:
+        -On Success:    the list of (path, ArchiveEntry object) tuples of the
+                        accepted files, with ArchiveEntry names if
+                        'as_object' is not set
+        """
+        return self._record(addfrom_iter(self.name, entries, inputfile,
+                                         outputfile, as_object,
+                                         self.p5_connection))
 
-    @onereturnvalue
     def addentry(self, path, key_value_list=None, as_object=True):
         """
         Syntax: ArchiveSelection <name> addentry <path>
@@ -526,10 +871,12 @@ class ArchiveSelection(P5Resource):
         If the passed <path> contains blanks, be sure to enclose it in curly
         braces: {/some/path with blanks/file}. Furthermore, if the <path>
         contains { and/or } chars themselves, you must escape them with a
-        backslash '\' character.
+        backslash '\' character. awp5.base.helpers.bracequote(path) does both.
         To each path, you can assign an arbitrary number of <key> and <value>
         pairs. Those are saved in the archive index and can be used for
         searches during restore (see RestoreSelection).
+        The <key> <value> pairs are given as 'key_value_list', either as list
+        of keys and values or as dict.
         Each key allows a string value of unlimited length. If the value
         contains blanks, it should be enclosed in curly braces. If the value
         itself contains curly braces, you must escape them with '\' character.
@@ -545,15 +892,10 @@ class ArchiveSelection(P5Resource):
                         Please see the ArchiveEntry resource description
         """
         method_name = "addentry"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, path,
-                                                  key_value_list])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, ArchiveEntry, self.p5_connection)
+        return self._record(_add(self._argv_head, method_name, path,
+                                 key_value_list, as_object,
+                                 self.p5_connection))
 
-    @onereturnvalue
     def addentryabs(self, path, key_value_list=None, as_object=True):
         """
         Syntax: ArchiveSelection <name> addentryabs <path>
@@ -567,7 +909,7 @@ class ArchiveSelection(P5Resource):
         If the passed <path> contains blanks, be sure to enclose it in curly
         braces: {/some/path with blanks/file}. Furthermore, if the <path>
         contains { and/or } chars themselves, you must escape them with a
-        backslash '\' character.
+        backslash '\' character. awp5.base.helpers.bracequote(path) does both.
         To each path, you can assign an arbitrary number of <key> and <value>
         pairs. Those are saved in the archive index and can be used for
         searches during restore (see RestoreSelection).
@@ -582,15 +924,10 @@ class ArchiveSelection(P5Resource):
                         Please see the ArchiveEntry resource description
         """
         method_name = "addentryabs"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, path,
-                                                  key_value_list])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, ArchiveEntry, self.p5_connection)
+        return self._record(_add(self._argv_head, method_name, path,
+                                 key_value_list, as_object,
+                                 self.p5_connection))
 
-    @onereturnvalue
     def adddirectory(self, path, key_value_list=None, as_object=True):
         """
         Syntax: ArchiveSelection <name> adddirectory <path>
@@ -612,15 +949,10 @@ class ArchiveSelection(P5Resource):
         -On Success:    see the addentry description for return values
         """
         method_name = "adddirectory"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, path,
-                                                  key_value_list])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, ArchiveEntry, self.p5_connection)
+        return self._record(_add(self._argv_head, method_name, path,
+                                 key_value_list, as_object,
+                                 self.p5_connection))
 
-    @onereturnvalue
     def adddirectoryabs(self, path, key_value_list=None, as_object=True):
         """
         Syntax: ArchiveSelection <name> adddirectoryabs <path>
@@ -641,15 +973,10 @@ class ArchiveSelection(P5Resource):
         -On Success:    see the addentry method for return values
         """
         method_name = "adddirectoryabs"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, path,
-                                                  key_value_list])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, ArchiveEntry, self.p5_connection)
+        return self._record(_add(self._argv_head, method_name, path,
+                                 key_value_list, as_object,
+                                 self.p5_connection))
 
-    @onereturnvalue
     def addfile(self, path, key_value_list=None, as_object=True):
         """
         Syntax: ArchiveSelection <name> addfile <path>
@@ -667,15 +994,10 @@ class ArchiveSelection(P5Resource):
         -On Success:    see the addentry method for return values
         """
         method_name = "addfile"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, path,
-                                                  key_value_list])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, ArchiveEntry, self.p5_connection)
+        return self._record(_add(self._argv_head, method_name, path,
+                                 key_value_list, as_object,
+                                 self.p5_connection))
 
-    @onereturnvalue
     def addfileabs(self, path, key_value_list=None, as_object=True):
         """
         Syntax: ArchiveSelection <name> addfileabs <path>
@@ -692,28 +1014,116 @@ class ArchiveSelection(P5Resource):
         -On Success:    see the addentry method for return values
         """
         method_name = "addfileabs"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, path,
-                                                  key_value_list])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, ArchiveEntry, self.p5_connection)
+        return self._record(_add(self._argv_head, method_name, path,
+                                 key_value_list, as_object,
+                                 self.p5_connection))
 
-    @onereturnvalue
-    def describe(self, title=None):
+    def batch(self):
+        """
+        Returns a Batch context manager, like pipeline but executing all
+        queued commands only when the with block is left.
+        """
+        return Batch(self.p5_connection)
+
+    def pipeline(self, depth=32):
+        """
+        Returns a Batch context manager. Inside its with block the add
+        methods (addentry, addfile, adddirectory and their abs variants)
+        called on this selection return a concurrent.futures.Future, and
+        their commands are executed in groups of 'depth' while the block is
+        filled, the rest when it is left. They run one after another in the
+        order they were called, on the session which created the selection,
+        so a submit or destroy called inside the block follows the adds:
+
+            with selection.pipeline():
+                added = [selection.addentry(path) for path in paths]
+            print([future.result() for future in added])
+        """
+        return Batch(self.p5_connection, depth)
+
+    def buffer_entry(self, path, key_value_list=None):
+        """
+        Buffers <path> (and its optional key/value pairs, see addentry) on
+        this object instead of adding it at once. The buffered entries are
+        added with flush_entries, or by submit before the selection is
+        submitted.
+        """
+        self._pending_paths.append(path)
+        self._pending_kvs.append(key_value_list)
+
+    def flush_entries(self, absolute=False, as_object=True):
+        """
+        Adds all entries buffered by buffer_entry with add_entries and
+        empties the buffer.
+        Return Values:
+        -On Success:    see add_entries
+        """
+        paths, kvs = self._pending_paths, self._pending_kvs
+        self._pending_paths, self._pending_kvs = [], []
+        return self.add_entries(zip(paths, kvs), absolute, as_object)
+
+    def add_entries(self, entries, absolute=False, as_object=True,
+                    kind="entry"):
+        """
+        Adds all 'entries' to the archive selection with addentry (or
+        addentryabs if 'absolute' is set), running the nsdchat calls as one
+        batch on the session which created the selection. Each entry is
+        either a path or a (path, key_value_list) pair, see the addentry
+        method for both.
+        With 'kind' set to "file" or "directory" the entries are added with
+        addfile or adddirectory (or their abs variants) instead.
+        Return Values:
+        -On Success:    the list of the ArchiveEntry objects (or names if
+                        'as_object' is not set) in the order of 'entries'.
+                        An entry that was not added or failed is None
+                        ("<empty>" or None for names)
+        """
+        return self._record(add_entries(self.name, entries, absolute,
+                                        as_object, self.p5_connection, kind))
+
+    def add_tree(self, root, key_value_list=None, prune=None, include=None,
+                 absolute=False, as_object=True):
+        """
+        Adds the directory 'root' and its contents recursively to the
+        archive selection, with a single addentry call unless 'prune' or
+        'include' is given. See the add_tree function for both.
+        Return Values:
+        -On Success:    the list of the ArchiveEntry objects (or names if
+                        'as_object' is not set), see add_entries
+        """
+        return self._record(add_tree(self.name, root, key_value_list, prune,
+                                     include, absolute, as_object,
+                                     self.p5_connection))
+
+    def add_delta(self, paths, statefile, key_value_list=None,
+                  absolute=False, as_object=True):
+        """
+        Adds those of 'paths' to the archive selection which are new or
+        changed since the last add_delta call with the same 'statefile'.
+        See the add_delta function for details.
+        Return Values:
+        -On Success:    the list of (path, ArchiveEntry object) tuples of
+                        the paths added (names if 'as_object' is not set)
+        """
+        self._statefile = statefile
+        return self._record(add_delta(self.name, paths, statefile,
+                                      key_value_list, absolute, as_object,
+                                      self.p5_connection))
+
+    def describe(self, title=None, bypass_cache=False):
         """
         Syntax: ArchiveSelection <name> describe  [title]
         Description: If a title is given, the title is set as the description
         in the job monitor. The method returns the current description
+        The queried value is cached for a short time (see cache_ttl), pass
+        bypass_cache=True to query the P5 server in any case.
         Return values:
         -On success:	the descriptions string as used in the job monitor
         """
         method_name = "describe"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, title])
+        return _setting(self._cmd(method_name), title, self.p5_connection,
+                        bypass_cache)
 
-    @onereturnvalue
     def destroy(self):
         """
         Syntax: ArchiveSelection <name> destroy
@@ -724,50 +1134,47 @@ class ArchiveSelection(P5Resource):
                         the string "1" (not destroyed)
         """
         method_name = "destroy"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _change(self._cmd(method_name), self.p5_connection)
 
-    @onereturnvalue
-    def entries(self):
+    def entries(self, bypass_cache=False):
         """
         Syntax: ArchiveSelection <name> entries
         Description: Returns the number of entries in the selection object.
+        The result is cached for a short time (see cache_ttl), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the number of entries
         """
-        method_name = "entries"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _size(self.name, self.p5_connection, bypass_cache)
 
-    @onereturnvalue
-    def level(self, level_value=None):
+    def level(self, level_value=None, bypass_cache=False):
         """
         Syntax: ArchiveSelection <name> [level]
         Description: Returns the level of the ArchiveSelection.
         If the optional level value is given, that level is set.
         The level must be either “full” or “increment”.
+        The queried value is cached for a short time (see cache_ttl), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string “full” or “increment”
         """
         method_name = "level"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, level_value])
+        return _setting(self._cmd(method_name), level_value,
+                        self.p5_connection, bypass_cache)
 
-    @onereturnvalue
-    def size(self):
+    def size(self, bypass_cache=False):
         """
         Syntax: ArchiveSelection <name> size
         Description: Returns the number of entries in the selection object.
         This method is deprecated, please use ArchiveSelection entries instead.
+        The result is cached for a short time (see cache_ttl), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the number of entries
         """
-        method_name = "size"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _size(self.name, self.p5_connection, bypass_cache)
 
-    @onereturnvalue
-    def submit(self, now=True, as_object=True):
+    def submit(self, now=True, as_object=True, force=False):
         """
         Syntax: ArchiveSelection <name> submit [<now>]
         Description: Submits the archive selection for execution. You can
@@ -776,23 +1183,34 @@ class ArchiveSelection(P5Resource):
         This command implicitly destroys the ArchiveSelection object for the
         user and transfers the ownership of the internal underlying object to
         the job scheduler. You should not attempt to use the <name> afterwards.
+        Entries still buffered by buffer_entry are added first.
+        If add_delta was called on the selection and none of its add methods
+        added an entry, the selection is destroyed instead of submitted and
+        the job ID of the last submit of a selection filled from the same
+        statefile is returned, unless 'force' is set. Otherwise the state
+        add_delta staged in the statefile is recorded once the submit has
+        succeeded.
         Return Values:
         -On Success:    the archive job ID. Use this job ID to query the
                         status of the job by using Job resource.
                         Please see the Job resource description for details.
         """
         method_name = "submit"
-        now_option = ""
-        if now is True:
-            now_option = "1"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, now_option])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, Job, self.p5_connection)
+        now_option = "1" if now in _now_values else None
+        transform = _transform(as_object and _job(), self.p5_connection)
+        if self._pending_paths:
+            self.flush_entries()
+        if self._statefile and not self._filled and not force:
+            job = _load_state(self._statefile)["job"]
+            if job:
+                self.destroy()
+                return transform([job])
+        if self._statefile:
+            transform = _recording(self._statefile, transform)
+        statcache.invalidate()
+        return _change(self._cmd(method_name, now_option),
+                       self.p5_connection, transform)
 
-    @onereturnvalue
     def onjobactivation(self, command=None):
         """
         Syntax: ArchiveSelection <name> onjobactivation <command>]
@@ -821,10 +1239,9 @@ class ArchiveSelection(P5Resource):
         -On Success:    the command string
         """
         method_name = "onjobactivation"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, command])
+        return submit_nsdchat(self._cmd(method_name, command),
+                              self.p5_connection, unwrap, bound=True)
 
-    @onereturnvalue
     def onjobcompletion(self, command=None):
         """
         Syntax: ArchiveSelection <name> onjobcompletion <command>
@@ -835,10 +1252,9 @@ class ArchiveSelection(P5Resource):
         -On Success:    the command string
         """
         method_name = "onjobcompletion"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, command])
+        return submit_nsdchat(self._cmd(method_name, command),
+                              self.p5_connection, unwrap, bound=True)
 
-    @onereturnvalue
     def onfiledeletion(self, command=None):
         """
         Syntax: ArchiveSelection <name> onfiledeletion <command>
@@ -848,9 +1264,9 @@ class ArchiveSelection(P5Resource):
         Return Values:
         -On Success:    the command string
         """
-        method_name = "onjobcompletion"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, command])
+        method_name = "onfiledeletion"
+        return submit_nsdchat(self._cmd(method_name, command),
+                              self.p5_connection, unwrap, bound=True)
 
     def __repr__(self):
         return ": ".join([module_name, self.name])
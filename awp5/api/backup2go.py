@@ -11,69 +11,104 @@ Queries Backup2Go templates configured on the Backup2Go Server and queries and
 controls their parameters. These commands are to be executed on the Backup2Go
 server.
 """
-from awp5.base.connection import P5Resource, exec_nsdchat
-from awp5.base.helpers import resourcelist, onereturnvalue
+import asyncio
+from awp5.base import metacache
+from awp5.base.connection import P5Resource, exec_nsdchat, async_query_nsdchat
+from awp5.base.connection import exec_nsdchat_batch, submit_nsdchat
+from awp5.base.helpers import LazyResourceList, onereturnvalue, unwrap
 
 module_name = "Backup2Go"
+# the cleanup arguments by (snapshots, trashes)
+_cleanup_areas = {(False, False): (), (True, False): ("snapshots",),
+                  (False, True): ("trashes",),
+                  (True, True): ("snapshots", "trashes")}
 
 
-def names(as_object=False, p5_connection=None):
+def _objects(p5_connection):
+    # transform turning the names result into Backup2Go objects, each created
+    # when it is accessed for the first time
+    return lambda result: LazyResourceList(result, Backup2Go, p5_connection)
+
+
+def _query(cmd, p5_connection, bypass_cache):
+    return metacache.submit_cached(cmd, p5_connection, unwrap, bypass_cache)
+
+
+def _change(cmd, p5_connection):
+    # submits 'cmd', which changes the template cmd[:2] names, so its
+    # cached queries are dropped once it has completed
+    return submit_nsdchat(cmd, p5_connection,
+                          metacache.invalidating(cmd[:2], p5_connection,
+                                                 unwrap))
+
+
+def _setting(cmd, value, p5_connection, bypass_cache):
+    # 'cmd' queries the setting, with 'value' appended it sets it; queried
+    # values are cached, setting one drops the cached values of the template
+    if value:
+        return _change(tuple(cmd) + (value,), p5_connection)
+    return _query(cmd, p5_connection, bypass_cache)
+
+
+def names(as_object=False, p5_connection=None, bypass_cache=False):
     """
     Syntax: Backup2Go names
     Description: Returns the list of names of all the Backup2Go templates
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the list of names
     """
     method_name = "names"
-    result = exec_nsdchat([module_name, method_name], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, Backup2Go, p5_connection)
+    return metacache.submit_cached([module_name, method_name], p5_connection,
+                                   as_object and _objects(p5_connection),
+                                   bypass_cache)
 
 
-@onereturnvalue
-def describe(template_name, p5_connection=None):
+def describe(template_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: Backup2Go <name> describe
     Description: Returns a human-readable description of the template <name>.
     If the template does not have a description assigned, the command returns
     the string "<empty>"
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the workstation description
     """
     method_name = "describe"
-    return exec_nsdchat([module_name, template_name, method_name],
-                        p5_connection)
+    return _query([module_name, template_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
-def disabled(template_name, p5_connection=None):
+def disabled(template_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: Backup2Go <name> disabled
     Description: Queries Backup2Go template Disabled status
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string "1" (disabled) or "0" (not disabled)
     """
     method_name = "disabled"
-    return exec_nsdchat([module_name, template_name, method_name],
-                        p5_connection)
+    return _query([module_name, template_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
-def enabled(template_name, p5_connection=None):
+def enabled(template_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: Backup2Go <name> enabled
     Description: Queries the template Enabled status.
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string "1" (enabled) or "0" (not enabled)
     """
     method_name = "enabled"
-    return exec_nsdchat([module_name, template_name, method_name],
-                        p5_connection)
+    return _query([module_name, template_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
 def disable(template_name, p5_connection=None):
     """
     Syntax: Backup2Go <name> disable
@@ -82,11 +117,9 @@ def disable(template_name, p5_connection=None):
     -On Success:    the string  "0"
     """
     method_name = "disable"
-    return exec_nsdchat([module_name, template_name, method_name],
-                        p5_connection)
+    return _change([module_name, template_name, method_name], p5_connection)
 
 
-@onereturnvalue
 def enable(template_name, p5_connection=None):
     """
     Syntax: Backup2Go <name> enable
@@ -95,8 +128,7 @@ def enable(template_name, p5_connection=None):
     -On Success:    the string  "1"
     """
     method_name = "enable"
-    return exec_nsdchat([module_name, template_name, method_name],
-                        p5_connection)
+    return _change([module_name, template_name, method_name], p5_connection)
 
 
 @onereturnvalue
@@ -110,88 +142,138 @@ def cleanup(template_name, snapshots=False, trashes=False, p5_connection=None):
     -On Success:    the string "ok"
     """
     method_name = "cleanup"
-    snapshots_option = ""
-    trashes_option = ""
-    if snapshots:
-        snapshots_option = "snapshots"
-    if trashes:
-        trashes_option = "trashes"
-    return exec_nsdchat([module_name, method_name, snapshots_option,
-                         trashes_option], p5_connection)
+    areas = _cleanup_areas[bool(snapshots), bool(trashes)]
+    result = exec_nsdchat((module_name, method_name) + areas, p5_connection)
+    metacache.invalidate([module_name], p5_connection)
+    return result
 
 
-@onereturnvalue
-def maxrunning(template_name, count=None, p5_connection=None):
+def maxrunning(template_name, count=None, p5_connection=None,
+               bypass_cache=False):
     """
     Syntax: Backup2Go <name> maxrunning [<count>]
     Description: Set up or report the maximum number of active workstations for
     the given template.
+    The reported value is cached for a short time (see awp5.base.metacache),
+    pass bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the number of active workstations,
                             the string "-1" for unlimited
     """
     method_name = "maxrunning"
-    return exec_nsdchat([module_name, template_name, method_name, count],
-                        p5_connection)
+    return _setting([module_name, template_name, method_name], count,
+                    p5_connection, bypass_cache)
+
+
+def bulk_set(states, p5_connection=None):
+    """
+    Applies the settings in 'states' to several templates at once, running
+    all nsdchat calls as one batch instead of one after the other. 'states'
+    maps template names to dicts with the keys "enabled" (True enables the
+    template, False disables it) and/or "maxrunning" (the count to set):
+        bulk_set({"Mac": {"enabled": True, "maxrunning": 4},
+                  "Win": {"enabled": False}})
+    Return Values:
+    -On Success:    the dict mapping each template name to the dict of the
+                    results of its settings (None for a failed one)
+    """
+    cmds = []
+    keys = []
+    for template_name, settings in states.items():
+        for setting, value in settings.items():
+            if setting == "enabled":
+                method_name = "enable" if value else "disable"
+                cmds.append([module_name, template_name, method_name])
+            elif setting == "maxrunning":
+                cmds.append([module_name, template_name, setting, value])
+            else:
+                raise ValueError("{} is not a Backup2Go setting".format(
+                    setting))
+            keys.append((template_name, setting))
+    batch_results = exec_nsdchat_batch(cmds, p5_connection)
+    for template_name in states:
+        metacache.invalidate([module_name, template_name], p5_connection)
+    results = {template_name: {} for template_name in states}
+    for (template_name, setting), result in zip(keys, batch_results):
+        results[template_name][setting] = \
+            None if result is None else unwrap(result)
+    return results
+
+
+# the queries with coroutine variants, see Backup2Go.gather
+_queries = ("describe", "disabled", "enabled", "maxrunning")
 
 
 class Backup2Go(P5Resource):
+    __slots__ = ('_argv_head',)
+
     def __init__(self, template_name, p5_connection):
         super().__init__(template_name, p5_connection)
+        self._argv_head = (module_name, self.name)
+
+    def _cmd(self, method_name, *args):
+        return self._argv_head + (method_name,) + args
 
-    def names(as_object=True, p5_connection=None):
+    async def _aquery(self, method_name):
+        result = await async_query_nsdchat(self._cmd(method_name),
+                                           self.p5_connection)
+        if result is None:
+            return None
+        return unwrap(result)
+
+    @staticmethod
+    def names(as_object=True, p5_connection=None, bypass_cache=False):
         """
         Syntax: Backup2Go names
         Description: Returns the list of names of all the Backup2Go templates
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the list of names
         """
-        method_name = "names"
-        result = exec_nsdchat([module_name, method_name], p5_connection)
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, Backup2Go, p5_connection)
-
-    @onereturnvalue
-    def describe(self):
+        return names(as_object, p5_connection, bypass_cache)
+
+    def describe(self, bypass_cache=False):
         """
         Syntax: Backup2Go <name> describe
         Description: Returns a human-readable description of the template
         <name>. If the template does not have a description assigned, the
         command returns the string "<empty>"
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the workstation description
         """
         method_name = "describe"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query(self._cmd(method_name), self.p5_connection,
+                      bypass_cache)
 
-    @onereturnvalue
-    def disabled(self):
+    def disabled(self, bypass_cache=False):
         """
         Syntax: Backup2Go <name> disabled
         Description: Queries Backup2Go template Disabled status
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string "1" (disabled) or "0" (not disabled)
         """
         method_name = "disabled"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query(self._cmd(method_name), self.p5_connection,
+                      bypass_cache)
 
-    @onereturnvalue
-    def enabled(self):
+    def enabled(self, bypass_cache=False):
         """
         Syntax: Backup2Go <name> enabled
         Description: Queries the template Enabled status.
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string "1" (enabled) or "0" (not enabled)
         """
         method_name = "enabled"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query(self._cmd(method_name), self.p5_connection,
+                      bypass_cache)
 
-    @onereturnvalue
     def disable(self):
         """
         Syntax: Backup2Go <name> disable
@@ -200,10 +282,8 @@ class Backup2Go(P5Resource):
         -On Success:    the string  "0"
         """
         method_name = "disable"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _change(self._cmd(method_name), self.p5_connection)
 
-    @onereturnvalue
     def enable(self):
         """
         Syntax: Backup2Go <name> enable
@@ -212,10 +292,9 @@ class Backup2Go(P5Resource):
         -On Success:    the string  "1"
         """
         method_name = "enable"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _change(self._cmd(method_name), self.p5_connection)
 
-    @onereturnvalue
+    @staticmethod
     def cleanup(snapshots=False, trashes=False, p5_connection=None):
         """
         Syntax: Backup2Go cleanup [snapshots] [trashes]
@@ -225,32 +304,73 @@ class Backup2Go(P5Resource):
         Return Values:
         -On Success:    the string "ok"
         """
-        method_name = "cleanup"
-        snapshots_option = ""
-        trashes_option = ""
-        if snapshots:
-            snapshots_option = "snapshots"
-        if trashes:
-            trashes_option = "trashes"
-        return exec_nsdchat([module_name, method_name, snapshots_option,
-                             trashes_option], p5_connection)
-
-    @onereturnvalue
-    def maxrunning(self, count=None):
+        return cleanup(None, snapshots, trashes, p5_connection)
+
+    def maxrunning(self, count=None, bypass_cache=False):
         """
         Syntax: Backup2Go <name> maxrunning [<count>]
         Description: Set up or report the maximum number of active workstations
         for the given template.
+        The reported value is cached for a short time (see
+        awp5.base.metacache), pass bypass_cache=True to query the P5 server in
+        any case.
         Return Values:
         -On Success:    the number of active workstations,
                                 the string "-1" for unlimited
         """
         method_name = "maxrunning"
-        count_option = ""
-        if count:
-            count_option = count
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, count_option])
+        return _setting(self._cmd(method_name), count, self.p5_connection,
+                        bypass_cache)
+
+    @staticmethod
+    def bulk_set(states, p5_connection=None):
+        """
+        Applies the "enabled" and "maxrunning" settings in 'states' to
+        several templates at once, see the bulk_set function.
+        Return Values:
+        -On Success:    the dict mapping each template name to the dict of
+                        the results of its settings
+        """
+        return bulk_set(states, p5_connection)
+
+    async def adescribe(self):
+        """
+        Coroutine variant of describe. The async variants of the queries let
+        many templates be queried at once, see gather.
+        """
+        return await self._aquery("describe")
+
+    async def adisabled(self):
+        """
+        Coroutine variant of disabled.
+        """
+        return await self._aquery("disabled")
+
+    async def aenabled(self):
+        """
+        Coroutine variant of enabled.
+        """
+        return await self._aquery("enabled")
+
+    async def amaxrunning(self):
+        """
+        Coroutine variant of maxrunning, reporting the configured count.
+        """
+        return await self._aquery("maxrunning")
+
+    @staticmethod
+    async def gather(templates, method):
+        """
+        Runs the query 'method' (describe, disabled, enabled or maxrunning)
+        for all 'templates' at once with its coroutine variant:
+            await Backup2Go.gather(Backup2Go.names(), "enabled")
+        Return Values:
+        -On Success:    the list of results in the order of 'templates'
+        """
+        if method not in _queries:
+            raise ValueError("{} is not a Backup2Go query".format(method))
+        return await asyncio.gather(*[getattr(template, "a" + method)()
+                                      for template in templates])
 
     def __repr__(self):
         return ": ".join([module_name, self.name])
@@ -16,75 +16,112 @@ changed, nor can plans be added or deleted. To configure and maintain backup
 plan resources, use the standard system administrator account in the
 P5 Web GUI.
 """
-from awp5.base.connection import P5Resource, exec_nsdchat
-from awp5.base.helpers import resourcelist, onereturnvalue
-from awp5.api.client import Client
-from awp5.api.job import Job
+from awp5.base import metacache
+from awp5.base.connection import P5Resource, exec_nsdchat, submit_nsdchat
+from awp5.base.connection import async_query_nsdchat, exec_nsdchat_fields
+from awp5.base.helpers import resource, resourcelist, unwrap
 
 module_name = "BackupPlan"
+# the query methods fetch runs by default
+_fields = ("describe", "disabled", "enabled")
+# the submit arguments, indexed by 'now is True'
+_submit_options = ((), ("now",))
 
 
-def names(as_object=False, p5_connection=None):
+def _job():
+    from awp5.api.job import Job
+    return Job
+
+
+def _transform(resource_class, p5_connection):
+    # submit returns the unwrapped job ID, or the Job object named by it;
+    # applied by submit_nsdchat, so inside a Batch the Future resolves to
+    # the same value
+    if not resource_class:
+        return unwrap
+    return lambda result: resource(result, resource_class, p5_connection)
+
+
+def _query(cmd, p5_connection, bypass_cache):
+    return metacache.submit_cached(cmd, p5_connection, unwrap, bypass_cache)
+
+
+def _control(argv_head, method_name, p5_connection):
+    # the common part of cancel, disable, enable and stop: they change the
+    # state of the plan 'argv_head' names, so its cached queries are dropped
+    # once they have completed
+    return submit_nsdchat(argv_head + (method_name,), p5_connection,
+                          metacache.invalidating(argv_head, p5_connection,
+                                                 unwrap))
+
+
+def names(as_object=False, p5_connection=None, bypass_cache=False):
     """
     Syntax: BackupPlan names
     Description: Returns a list of names of all the BackupPlan resources
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    a list of names. If no backup plans have been
                     configured, the command returns the string
                     "<empty>"
     """
     method_name = "names"
-    result = exec_nsdchat([module_name, method_name], p5_connection)
+    cmd = [module_name, method_name]
+    result = metacache.cached(cmd, lambda: exec_nsdchat(cmd, p5_connection),
+                              p5_connection, bypass_cache)
     if not as_object:
         return result
     else:
         return resourcelist(result, BackupPlan, p5_connection)
 
 
-@onereturnvalue
-def describe(backupplan_name, p5_connection=None):
+def describe(backupplan_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: BackupPlan <name> describe
     Description: Returns a human-readable description for the <name> plan. The
     <name> is one of the elements returned by the names method. If the element
     does not have a description assigned, the command returns the string
     "<empty>".
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the resource description. If no description has been set
                     the command returns the string "<empty>"
     """
     method_name = "describe"
-    return exec_nsdchat([module_name, backupplan_name, method_name],
-                        p5_connection)
+    return _query([module_name, backupplan_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
-def disabled(backupplan_name, p5_connection=None):
+def disabled(backupplan_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: BackupPlan <name> disabled
     Description: Queries the Disabled status
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string "1" (the plan is disabled) or "0" (not disabled)
     """
     method_name = "disabled"
-    return exec_nsdchat([module_name, backupplan_name, method_name],
-                        p5_connection)
+    return _query([module_name, backupplan_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
-def enabled(backupplan_name, p5_connection=None):
+def enabled(backupplan_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: BackupPlan <name> enabled
     Description: Queries the Enabled status
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string "1" (the plan is enabled) or "0" (not enabled)
     """
     method_name = "enabled"
-    return exec_nsdchat([module_name, backupplan_name, method_name],
-                        p5_connection)
+    return _query([module_name, backupplan_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
 def cancel(backupplan_name, p5_connection=None):
     """
     Syntax: BackupPlan <name> cancel
@@ -96,11 +133,10 @@ def cancel(backupplan_name, p5_connection=None):
                     the string "0" (the plan was not canceled or running)
     """
     method_name = "cancel"
-    return exec_nsdchat([module_name, backupplan_name, method_name],
-                        p5_connection)
+    return _control((module_name, backupplan_name), method_name,
+                    p5_connection)
 
 
-@onereturnvalue
 def disable(backupplan_name, p5_connection=None):
     """
     Syntax: BackupPlan <name> disable
@@ -109,11 +145,10 @@ def disable(backupplan_name, p5_connection=None):
     -On Success:    the string "0"
     """
     method_name = "disable"
-    return exec_nsdchat([module_name, backupplan_name, method_name],
-                        p5_connection)
+    return _control((module_name, backupplan_name), method_name,
+                    p5_connection)
 
 
-@onereturnvalue
 def enable(backupplan_name, p5_connection=None):
     """
     Syntax: BackupPlan <name> enable
@@ -122,11 +157,10 @@ def enable(backupplan_name, p5_connection=None):
     -On Success:    the string "1"
     """
     method_name = "enable"
-    return exec_nsdchat([module_name, backupplan_name, method_name],
-                        p5_connection)
+    return _control((module_name, backupplan_name), method_name,
+                    p5_connection)
 
 
-@onereturnvalue
 def submit(backupplan_name, now=True, p5_connection=None, as_object=False):
     """
     Syntax: BackupPlan <name> submit [<now>]
@@ -138,22 +172,20 @@ def submit(backupplan_name, now=True, p5_connection=None, as_object=False):
     Note: In order to run a backup plan, a backup event must be selected. The
     start method implicitly selects the next planned backup event to start the
     backup plan.
+    Inside a Batch the job ID is a Future, which can be passed on to the Job
+    queries of the same batch:
+        with batch():
+            job_id = submit(backupplan_name)
+            job_status = awp5.api.job.status(job_id)
     Return Values:
     -On Success:    the backup job ID
     """
     method_name = "submit"
-    now_option = ""
-    if now is True:
-        now_option = "now"
-    result = exec_nsdchat([module_name, backupplan_name, method_name,
-                           now_option], p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, Job, p5_connection)
+    return submit_nsdchat((module_name, backupplan_name, method_name) +
+                          _submit_options[now is True], p5_connection,
+                          _transform(as_object and _job(), p5_connection))
 
 
-@onereturnvalue
 def stop(backupplan_name, p5_connection=None):
     """
     Syntax: BackupPlan <name> stop
@@ -163,72 +195,110 @@ def stop(backupplan_name, p5_connection=None):
                     the string "0" (the plan was not removed or is running)
     """
     method_name = "stop"
-    return exec_nsdchat([module_name, backupplan_name, method_name],
-                        p5_connection)
+    return _control((module_name, backupplan_name), method_name,
+                    p5_connection)
+
+
+def fetch(backupplan_names, fields=_fields, p5_connection=None):
+    """
+    Queries the given 'fields' for each plan in 'backupplan_names' with
+    one batch of nsdchat calls instead of one call after the other. The
+    'fields' are the names of the BackupPlan query methods without arguments:
+    describe, disabled, enabled.
+    Return Values:
+    -On Success:    a dict mapping each backup plan name to a dict of the field
+                    names and their values
+    """
+    return exec_nsdchat_fields(module_name, backupplan_names, fields,
+                               p5_connection)
+
+
+def scan(fields=_fields, p5_connection=None):
+    """
+    Queries the given 'fields' (see fetch) of all the backup plans: the names
+    are queried first, then the fields of all of them with one batch of
+    nsdchat calls.
+    Return Values:
+    -On Success:    the list of dicts with the backup plan "name" and the field
+                    names and their values, in the order of names
+    """
+    values = fetch(names(True, p5_connection), fields, p5_connection)
+    return [dict(name=name, **queried) for name, queried in values.items()]
 
 
 class BackupPlan(P5Resource):
+    __slots__ = ()
+
     def __init__(self, backupplan_name, p5_connection=None):
         super().__init__(backupplan_name, p5_connection)
 
-    def names(as_object=True, p5_connection=None):
+    async def _aquery(self, method_name, *args):
+        result = await async_query_nsdchat(
+            [module_name, self.name, method_name] + list(args),
+            self.p5_connection)
+        if result is None:
+            return None
+        return unwrap(result)
+
+    @staticmethod
+    def names(as_object=True, p5_connection=None, bypass_cache=False):
         """
         Syntax: BackupPlan names
         Description: Returns a list of names of all the BackupPlan resources
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    a list of names. If no backup plans have been
                         configured, the command returns the string
                         "<empty>"
         """
-        method_name = "names"
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, BackupPlan, p5_connection)
-
-    @onereturnvalue
-    def describe(self):
+        return names(as_object, p5_connection, bypass_cache)
+
+    def describe(self, bypass_cache=False):
         """
         Syntax: BackupPlan <name> describe
         Description: Returns a human-readable description for the <name> plan.
         The <name> is one of the elements returned by the names method. If the
         element does not have a description assigned, the command returns the
         string "<empty>".
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the resource description. If no description has been
                         set the command returns the string "<empty>"
         """
         method_name = "describe"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query([module_name, self.name, method_name],
+                      self.p5_connection, bypass_cache)
 
-    @onereturnvalue
-    def disabled(self):
+    def disabled(self, bypass_cache=False):
         """
         Syntax: BackupPlan <name> disabled
         Description: Queries the Disabled status
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string "1" (the plan is disabled) or "0" (not
         disabled)
         """
         method_name = "disabled"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query([module_name, self.name, method_name],
+                      self.p5_connection, bypass_cache)
 
-    @onereturnvalue
-    def enabled(self):
+    def enabled(self, bypass_cache=False):
         """
         Syntax: BackupPlan <name> enabled
         Description: Queries the Enabled status
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string "1" (the plan is enabled) or "0" (not
         enabled)
         """
         method_name = "enabled"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query([module_name, self.name, method_name],
+                      self.p5_connection, bypass_cache)
 
-    @onereturnvalue
     def cancel(self):
         """
         Syntax: BackupPlan <name> cancel
@@ -240,10 +310,9 @@ class BackupPlan(P5Resource):
                         the string "0" (the plan was not canceled or running)
         """
         method_name = "cancel"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _control((module_name, self.name), method_name,
+                        self.p5_connection)
 
-    @onereturnvalue
     def disable(self):
         """
         Syntax: BackupPlan <name> disable
@@ -252,10 +321,9 @@ class BackupPlan(P5Resource):
         -On Success:    the string "0"
         """
         method_name = "disable"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _control((module_name, self.name), method_name,
+                        self.p5_connection)
 
-    @onereturnvalue
     def enable(self):
         """
         Syntax: BackupPlan <name> enable
@@ -264,10 +332,9 @@ class BackupPlan(P5Resource):
         -On Success:    the string "1"
         """
         method_name = "enable"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _control((module_name, self.name), method_name,
+                        self.p5_connection)
 
-    @onereturnvalue
     def submit(self, now=True, as_object=True):
         """
         Syntax: BackupPlan <name> submit [<now>]
@@ -280,21 +347,17 @@ class BackupPlan(P5Resource):
         Note: In order to run a backup plan, a backup event must be selected.
         The start method implicitly selects the next planned backup event to
         start the backup plan.
+        Inside a Batch the job (ID) is a Future, see the submit function.
         Return Values:
         -On Success:    the backup job ID
         """
         method_name = "submit"
-        now_option = ""
-        if now is True:
-            now_option = "now"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name, now_option])
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, Job, self.p5_connection)
-
-    @onereturnvalue
+        return submit_nsdchat((module_name, self.name, method_name) +
+                              _submit_options[now is True],
+                              self.p5_connection,
+                              _transform(as_object and _job(),
+                                         self.p5_connection))
+
     def stop(self):
         """
         Syntax: BackupPlan <name> stop
@@ -304,8 +367,51 @@ class BackupPlan(P5Resource):
                         the string "0" (the plan was not removed or is running)
         """
         method_name = "stop"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _control((module_name, self.name), method_name,
+                        self.p5_connection)
+
+    @staticmethod
+    def fetch(backupplan_names, fields=_fields, p5_connection=None):
+        """
+        Queries the given 'fields' for each plan in 'backupplan_names'
+        (names or BackupPlan objects) with one batch of nsdchat calls, see the
+        fetch function.
+        Return Values:
+        -On Success:    a dict mapping each backup plan name to a dict of the
+                        field names and their values
+        """
+        return fetch(backupplan_names, fields, p5_connection)
+
+    @staticmethod
+    def scan(fields=_fields, p5_connection=None):
+        """
+        Queries the given 'fields' of all the backup plans, see the scan
+        function.
+        Return Values:
+        -On Success:    the list of dicts with the backup plan "name" and the
+                        field names and their values
+        """
+        return scan(fields, p5_connection)
+
+    async def adescribe(self):
+        """
+        Coroutine variant of describe. The async variants of the queries let
+        many plans be queried at once, e.g.
+            await asyncio.gather(*[plan.adescribe() for plan in plans])
+        """
+        return await self._aquery("describe")
+
+    async def adisabled(self):
+        """
+        Coroutine variant of disabled.
+        """
+        return await self._aquery("disabled")
+
+    async def aenabled(self):
+        """
+        Coroutine variant of enabled.
+        """
+        return await self._aquery("enabled")
 
     def __repr__(self):
-        return ": ".join([__class__.__name__, self.name])
+        return module_name + ": " + self.name
@@ -16,81 +16,103 @@ You can't modify any of the existing client resources nor can you create new or
 delete existing clients. To configure and maintain client resources, use the
 standard system administrator account in the P5 Web GUI.
 """
-from awp5.base.connection import P5Resource, exec_nsdchat
-from awp5.base.helpers import resourcelist, onereturnvalue
+from awp5.base import metacache
+from awp5.base.connection import P5Resource, exec_nsdchat, submit_nsdchat
+from awp5.base.connection import async_query_nsdchat, exec_nsdchat_fields
+from awp5.base.helpers import resourcelist, unwrap
 
 module_name = "Client"
+# the query methods fetch runs by default
+_fields = ("describe", "hostname", "isthin", "port")
 
 
-def names(as_object=False, p5_connection=None):
+def _timeout_options(timeout):
+    # the [<timeout>] argument of ping in whole seconds, left out if not given
+    return () if timeout is None else (str(int(timeout)),)
+
+
+def _query(cmd, p5_connection, bypass_cache):
+    return metacache.submit_cached(cmd, p5_connection, unwrap, bypass_cache)
+
+
+def names(as_object=False, p5_connection=None, bypass_cache=False):
     """
-    Syntax: Client <name> describe
-    Description: Returns a human-readable description of the client <name>. If
-    the client does not have a description assigned, the command returns the
-    string "<empty>"
+    Syntax: Client names
+    Description: Returns the list of names of all the client resources
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
-    -On Success:    the client description
+    -On Success:    the list of client names
     """
     method_name = "names"
-    result = exec_nsdchat([module_name, method_name], p5_connection)
+    cmd = [module_name, method_name]
+    result = metacache.cached(cmd, lambda: exec_nsdchat(cmd, p5_connection),
+                              p5_connection, bypass_cache)
     if not as_object:
         return result
     else:
         return resourcelist(result, Client, p5_connection)
 
 
-@onereturnvalue
-def describe(client_name, p5_connection=None):
+def describe(client_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: Client <name> describe
     Description: Returns a human-readable description of the client <name>. If
     the client does not have .
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the client description
     """
     method_name = "describe"
-    return exec_nsdchat([module_name, client_name, method_name], p5_connection)
+    return _query([module_name, client_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
-def hostname(client_name, p5_connection=None):
+def hostname(client_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: Client <name> hostname
     Description: Returns the host name (or IP address) of the client <name>
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the host name or IP address
     """
     method_name = "hostname"
-    return exec_nsdchat([module_name, client_name, method_name], p5_connection)
+    return _query([module_name, client_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
-def isthin(client_name, p5_connection=None):
+def isthin(client_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: Client <name> isthin
     Description: Returns true in case the client is of type Workstation  (as
     opposed to type Server)
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the string “1” if the client type is Workstation
                     the string “0”  otherwise
     """
     method_name = "isthin"
-    return exec_nsdchat([module_name, client_name, method_name], p5_connection)
+    return _query([module_name, client_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
-def port(client_name, p5_connection=None):
+def port(client_name, p5_connection=None, bypass_cache=False):
     """
     Syntax: Client <name> port
     Description: Returns the TCP port of the client <name>
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the configured TCP port
     """
     method_name = "port"
-    return exec_nsdchat([module_name, client_name, method_name], p5_connection)
+    return _query([module_name, client_name, method_name], p5_connection,
+                  bypass_cache)
 
 
-@onereturnvalue
 def ping(client_name, timeout=None, p5_connection=None):
     """
     Syntax: Client <name> ping [<timeout>]
@@ -108,87 +130,119 @@ def ping(client_name, timeout=None, p5_connection=None):
     "1"     ping OK
     """
     method_name = "ping"
-    timeout_option = ""
-    if timeout:
-        timeout_option = timeout
-    method_name = "ping"
-    return exec_nsdchat([module_name, client_name, method_name,
-                        timeout_option], p5_connection)
+    return submit_nsdchat((module_name, client_name, method_name) +
+                          _timeout_options(timeout), p5_connection, unwrap)
+
+
+def fetch(client_names, fields=_fields, p5_connection=None):
+    """
+    Queries the given 'fields' for each client in 'client_names' with
+    one batch of nsdchat calls instead of one call after the other. The
+    'fields' are the names of the Client query methods without arguments:
+    describe, hostname, isthin, port.
+    Return Values:
+    -On Success:    a dict mapping each client name to a dict of the field
+                    names and their values
+    """
+    return exec_nsdchat_fields(module_name, client_names, fields,
+                               p5_connection)
+
+
+def scan(fields=_fields, p5_connection=None):
+    """
+    Queries the given 'fields' (see fetch) of all the clients: the names
+    are queried first, then the fields of all of them with one batch of
+    nsdchat calls.
+    Return Values:
+    -On Success:    the list of dicts with the client "name" and the field
+                    names and their values, in the order of names
+    """
+    values = fetch(names(True, p5_connection), fields, p5_connection)
+    return [dict(name=name, **queried) for name, queried in values.items()]
 
 
 class Client(P5Resource):
+    __slots__ = ()
+
     def __init__(self, client_name, p5_connection=None):
         super().__init__(client_name, p5_connection)
 
-    def names(as_object=True, p5_connection=None):
+    async def _aquery(self, method_name, *args):
+        result = await async_query_nsdchat(
+            [module_name, self.name, method_name] + list(args),
+            self.p5_connection)
+        if result is None:
+            return None
+        return unwrap(result)
+
+    @staticmethod
+    def names(as_object=True, p5_connection=None, bypass_cache=False):
         """
-        Syntax: Client <name> describe
-        Description: Returns a human-readable description of the client <name>.
-        If the client does not have a description assigned, the command returns
-        the string "<empty>"
+        Syntax: Client names
+        Description: Returns the list of names of all the client resources
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
-        -On Success:    the client description
+        -On Success:    the list of client names
         """
-        method_name = "names"
-        result = exec_nsdchat([module_name, method_name], p5_connection)
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, Client, p5_connection)
+        return names(as_object, p5_connection, bypass_cache)
 
-    @onereturnvalue
-    def describe(self):
+    def describe(self, bypass_cache=False):
         """
         Syntax: Client <name> describe
         Description: Returns a human-readable description of the client <name>.
         If the client does not have a description assigned, the command returns
         the string "<empty>"
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the client description
         """
         method_name = "describe"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query([module_name, self.name, method_name],
+                      self.p5_connection, bypass_cache)
 
-    @onereturnvalue
-    def hostname(self):
+    def hostname(self, bypass_cache=False):
         """
         Syntax: Client <name> hostname
         Description: Returns the host name (or IP address) of the client <name>
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the host name or IP address
         """
         method_name = "hostname"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query([module_name, self.name, method_name],
+                      self.p5_connection, bypass_cache)
 
-    @onereturnvalue
-    def isthin(self):
+    def isthin(self, bypass_cache=False):
         """
         Syntax: Client <name> isthin
         Description: Returns true in case the client is of type Workstation (as
         opposed to type Server)
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the string “1” if the client type is Workstation
                         the string “0”  otherwise
         """
         method_name = "isthin"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query([module_name, self.name, method_name],
+                      self.p5_connection, bypass_cache)
 
-    @onereturnvalue
-    def port(self):
+    def port(self, bypass_cache=False):
         """
         Syntax: Client <name> port
         Description: Returns the TCP port of the client <name>
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the configured TCP port
         """
         method_name = "port"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return _query([module_name, self.name, method_name],
+                      self.p5_connection, bypass_cache)
 
-    @onereturnvalue
     def ping(self, timeout=None):
         """
         Syntax: Client <name> ping [<timeout>]
@@ -206,8 +260,65 @@ class Client(P5Resource):
         "1"     ping OK
         """
         method_name = "ping"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, timeout])
+        return submit_nsdchat((module_name, self.name, method_name) +
+                              _timeout_options(timeout), self.p5_connection,
+                              unwrap)
+
+    @staticmethod
+    def fetch(client_names, fields=_fields, p5_connection=None):
+        """
+        Queries the given 'fields' for each client in 'client_names'
+        (names or Client objects) with one batch of nsdchat calls, see the
+        fetch function.
+        Return Values:
+        -On Success:    a dict mapping each client name to a dict of the
+                        field names and their values
+        """
+        return fetch(client_names, fields, p5_connection)
+
+    @staticmethod
+    def scan(fields=_fields, p5_connection=None):
+        """
+        Queries the given 'fields' of all the clients, see the scan
+        function.
+        Return Values:
+        -On Success:    the list of dicts with the client "name" and the
+                        field names and their values
+        """
+        return scan(fields, p5_connection)
+
+    async def adescribe(self):
+        """
+        Coroutine variant of describe. The async variants of the queries let
+        many clients be queried at once, e.g.
+            await asyncio.gather(*[client.adescribe() for client in clients])
+        """
+        return await self._aquery("describe")
+
+    async def ahostname(self):
+        """
+        Coroutine variant of hostname.
+        """
+        return await self._aquery("hostname")
+
+    async def aisthin(self):
+        """
+        Coroutine variant of isthin.
+        """
+        return await self._aquery("isthin")
+
+    async def aport(self):
+        """
+        Coroutine variant of port.
+        """
+        return await self._aquery("port")
+
+    async def aping(self, timeout=None):
+        """
+        Coroutine variant of ping, so that many clients can be pinged at once
+        and the slowest one bounds the wall-clock time.
+        """
+        return await self._aquery("ping", *_timeout_options(timeout))
 
     def __repr__(self):
-        return ": ".join([module_name, self.name])
+        return module_name + ": " + self.name
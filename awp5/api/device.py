@@ -10,30 +10,60 @@ Device
 This resource tracks tape devices, including single tape drives, tape drives
 within a jukebox and drives in a virtual jukebox.
 """
-from awp5.base.connection import P5Resource, exec_nsdchat
-from awp5.base.helpers import resourcelist, onereturnvalue
-from awp5.api.volume import Volume
+import asyncio
+from awp5.base import metacache
+from awp5.base.connection import P5Resource, exec_nsdchat, submit_nsdchat
+from awp5.base.connection import async_exec_nsdchat, async_query_nsdchat
+from awp5.base.connection import exec_nsdchat_fields
+from awp5.base.helpers import resource, resourcelist, unwrap
 
 module_name = "Device"
+# the query methods fetch runs by default
+_fields = ("cleaning",)
 
 
-def names(as_object=False, p5_connection=None):
+def _volume():
+    from awp5.api.volume import Volume
+    return Volume
+
+
+def _transform(resource_class, p5_connection):
+    # inventory returns the unwrapped volume name, or the Volume object named
+    # by it; applied by submit_nsdchat, so inside a Batch the Future resolves
+    # to the same value
+    if not resource_class:
+        return unwrap
+    return lambda result: resource(result, resource_class, p5_connection)
+
+
+def _cleaning_options(value):
+    # the [value] argument of cleaning: none to query the flag, "1" or "0"
+    # to set it (0 and False included)
+    if value is None:
+        return ()
+    return ("0",) if value in (0, "0") else ("1",)
+
+
+def names(as_object=False, p5_connection=None, bypass_cache=False):
     """
     Syntax: Device names
     Description: Returns a list of single tape device resources.
+    The result is cached for a short time (see awp5.base.metacache), pass
+    bypass_cache=True to query the P5 server in any case.
     Return Values:
     -On Success:    the list of device names
                     the string "<empty>" if no devices are configured
     """
     method_name = "names"
-    result = exec_nsdchat([module_name, method_name], p5_connection)
+    cmd = [module_name, method_name]
+    result = metacache.cached(cmd, lambda: exec_nsdchat(cmd, p5_connection),
+                              p5_connection, bypass_cache)
     if not as_object:
         return result
     else:
         return resourcelist(result, Device, p5_connection)
 
 
-@onereturnvalue
 def cleaning(device_name, value=None, p5_connection=None):
     """
     Syntax: Device <name> cleaning [value]
@@ -46,17 +76,10 @@ def cleaning(device_name, value=None, p5_connection=None):
     -On Success:    the string "1" or "0"
     """
     method_name = "cleaning"
-    value_option = ""
-    if value:
-        if value is True:
-            value_option = "1"
-        else:
-            value_option = "0"
-    return exec_nsdchat([module_name, device_name, method_name, value_option],
-                        p5_connection)
+    return submit_nsdchat((module_name, device_name, method_name) +
+                          _cleaning_options(value), p5_connection, unwrap)
 
 
-@onereturnvalue
 def inventory(device_name, as_object=False, p5_connection=None):
     """
     Syntax: Device <name> inventory
@@ -68,34 +91,109 @@ def inventory(device_name, as_object=False, p5_connection=None):
     -On Success:    the volume name
     """
     method_name = "inventory"
-    result = exec_nsdchat([module_name, device_name, method_name],
-                          p5_connection)
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, Volume, p5_connection)
+    return submit_nsdchat([module_name, device_name, method_name],
+                          p5_connection,
+                          _transform(as_object and _volume(), p5_connection))
+
+
+def inventory_all(p5_connection=None, concurrency=4):
+    """
+    Performs an inventory (see inventory) for all the devices, running the
+    nsdchat calls in batches of 'concurrency' instead of one after the
+    other, to respect the number of drives a tape library can operate at
+    once.
+    Return Values:
+    -On Success:    a dict mapping each device name to the name of its
+                    currently loaded volume (None if its inventory failed)
+    """
+    method_name = "inventory"
+    device_names = names(True, p5_connection)
+    inventories = {}
+    for start in range(0, len(device_names), concurrency):
+        values = exec_nsdchat_fields(module_name,
+                                     device_names[start:start + concurrency],
+                                     (method_name,), p5_connection)
+        for name, value in values.items():
+            inventories[name] = value[method_name]
+    return inventories
+
+
+async def inventory_all_async(concurrency=4, p5_connection=None):
+    """
+    Coroutine variant of inventory_all running at most 'concurrency'
+    inventories at the same time, to respect the number of drives a tape
+    library can operate at once.
+    Return Values:
+    -On Success:    see inventory_all
+    """
+    method_name = "inventory"
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run(device_name):
+        async with limit:
+            result = await async_exec_nsdchat(
+                [module_name, device_name, method_name], p5_connection)
+        return None if result is None else unwrap(result)
+    device_names = [str(device) for device in names(True, p5_connection)]
+    results = await asyncio.gather(*[run(device_name)
+                                     for device_name in device_names])
+    return dict(zip(device_names, results))
+
+
+def fetch(device_names, fields=_fields, p5_connection=None):
+    """
+    Queries the given 'fields' for each device in 'device_names' with
+    one batch of nsdchat calls instead of one call after the other. The
+    'fields' are the names of the Device query methods without arguments:
+    cleaning.
+    Return Values:
+    -On Success:    a dict mapping each device name to a dict of the field
+                    names and their values
+    """
+    return exec_nsdchat_fields(module_name, device_names, fields,
+                               p5_connection)
+
+
+def scan(fields=_fields, p5_connection=None):
+    """
+    Queries the given 'fields' (see fetch) of all the devices: the names
+    are queried first, then the fields of all of them with one batch of
+    nsdchat calls.
+    Return Values:
+    -On Success:    the list of dicts with the device "name" and the field
+                    names and their values, in the order of names
+    """
+    values = fetch(names(True, p5_connection), fields, p5_connection)
+    return [dict(name=name, **queried) for name, queried in values.items()]
 
 
 class Device(P5Resource):
+    __slots__ = ()
+
     def __init__(self, device_name, p5_connection=None):
         super().__init__(device_name, p5_connection)
 
-    def names(as_object=True, p5_connection=None):
+    async def _aquery(self, method_name, *args):
+        result = await async_query_nsdchat(
+            [module_name, self.name, method_name] + list(args),
+            self.p5_connection)
+        if result is None:
+            return None
+        return unwrap(result)
+
+    @staticmethod
+    def names(as_object=True, p5_connection=None, bypass_cache=False):
         """
         Syntax: Device names
         Description: Returns a list of single tape device resources.
+        The result is cached for a short time (see awp5.base.metacache), pass
+        bypass_cache=True to query the P5 server in any case.
         Return Values:
         -On Success:    the list of device names
                         the string "<empty>" if no devices are configured
         """
-        method_name = "names"
-        result = exec_nsdchat([module_name, method_name], p5_connection)
-        if not as_object:
-            return result
-        else:
-            return resourcelist(result, Device, p5_connection)
+        return names(as_object, p5_connection, bypass_cache)
 
-    @onereturnvalue
     def cleaning(self, value=None):
         """
         Syntax: Device <name> cleaning [value]
@@ -108,16 +206,10 @@ class Device(P5Resource):
         -On Success:    the string "1" or "0"
         """
         method_name = "cleaning"
-        value_option = ""
-        if value:
-            if value is True:
-                value_option = "1"
-            else:
-                value_option = "0"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, value_option])
-
-    @onereturnvalue
+        return submit_nsdchat((module_name, self.name, method_name) +
+                              _cleaning_options(value), self.p5_connection,
+                              unwrap)
+
     def inventory(self, as_object=True):
         """
         Syntax: Device <name> inventory
@@ -129,12 +221,73 @@ class Device(P5Resource):
         -On Success:    the volume name
         """
         method_name = "inventory"
-        result = self.p5_connection.nsdchat_call([module_name, self.name,
-                                                  method_name])
+        return submit_nsdchat([module_name, self.name, method_name],
+                              self.p5_connection,
+                              _transform(as_object and _volume(),
+                                         self.p5_connection))
+
+    @staticmethod
+    def inventory_all(p5_connection=None, concurrency=4):
+        """
+        Performs an inventory for all the devices in batches of
+        'concurrency', see the inventory_all function.
+        Return Values:
+        -On Success:    a dict mapping each device name to the name of its
+                        currently loaded volume
+        """
+        return inventory_all(p5_connection, concurrency)
+
+    @staticmethod
+    async def inventory_all_async(concurrency=4, p5_connection=None):
+        """
+        Coroutine variant of inventory_all with at most 'concurrency'
+        inventories at the same time, see inventory_all_async.
+        """
+        return await inventory_all_async(concurrency, p5_connection)
+
+    @staticmethod
+    def fetch(device_names, fields=_fields, p5_connection=None):
+        """
+        Queries the given 'fields' for each device in 'device_names'
+        (names or Device objects) with one batch of nsdchat calls, see the
+        fetch function.
+        Return Values:
+        -On Success:    a dict mapping each device name to a dict of the
+                        field names and their values
+        """
+        return fetch(device_names, fields, p5_connection)
+
+    @staticmethod
+    def scan(fields=_fields, p5_connection=None):
+        """
+        Queries the given 'fields' of all the devices, see the scan
+        function.
+        Return Values:
+        -On Success:    the list of dicts with the device "name" and the
+                        field names and their values
+        """
+        return scan(fields, p5_connection)
+
+    async def acleaning(self):
+        """
+        Coroutine variant of cleaning, querying the current value of the
+        flag.
+        """
+        return await self._aquery("cleaning")
+
+    async def ainventory(self, as_object=True):
+        """
+        Coroutine variant of inventory. The inventories of several devices
+        can run at once, e.g.
+            await asyncio.gather(*[device.ainventory() for device in devices])
+        """
+        result = await async_exec_nsdchat([module_name, self.name,
+                                           "inventory"], self.p5_connection)
+        if result is None:
+            return None
         if not as_object:
-            return result
-        else:
-            return resourcelist(result, Volume, self.p5_connection)
+            return unwrap(result)
+        return resource(result, _volume(), self.p5_connection)
 
     def __repr__(self):
-        return ": ".join([module_name, self.name])
+        return module_name + ": " + self.name
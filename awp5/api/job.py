@@ -12,8 +12,8 @@ of the submitted jobs is held indefinitely and can be queried by the user at
 any time. Job resources are generated automatically, for instance by the submit
 methods of the ArchiveSelection resource.
 """
-from awp5.base.connection import P5Resource, exec_nsdchat
-from awp5.base.helpers import resourcelist, onereturnvalue
+from awp5.base.connection import P5Resource, exec_nsdchat, submit_nsdchat
+from awp5.base.helpers import resourcelist, onereturnvalue, unwrap
 
 module_name = "Job"
 
@@ -57,7 +57,6 @@ def completed(lastdays=None, as_object=False, p5_connection=None):
         return resourcelist(result, Job, p5_connection)
 
 
-@onereturnvalue
 def completion(job_name, p5_connection=None):
     """
     Syntax: Job <name> completion
@@ -80,10 +79,10 @@ def completion(job_name, p5_connection=None):
     -On Success:    one of the completion codes
     """
     method_name = "completion"
-    return exec_nsdchat([module_name, job_name, method_name], p5_connection)
+    return submit_nsdchat([module_name, job_name, method_name],
+                          p5_connection, unwrap)
 
 
-@onereturnvalue
 def describe(job_name, p5_connection=None):
     """
     Syntax: Job <name> describe
@@ -93,7 +92,8 @@ def describe(job_name, p5_connection=None):
     -On Success:    the job description
     """
     method_name = "describe"
-    return exec_nsdchat([module_name, job_name, method_name], p5_connection)
+    return submit_nsdchat([module_name, job_name, method_name],
+                          p5_connection, unwrap)
 
 
 def failed(lastdays=None, as_object=False, p5_connection=None):
@@ -173,7 +173,6 @@ def inventory(job_name, outputfile, options=None, p5_connection=None):
                         options], p5_connection)
 
 
-@onereturnvalue
 def label(job_name, p5_connection=None):
     """
     Syntax: Job <name> label
@@ -186,7 +185,8 @@ def label(job_name, p5_connection=None):
     -On Success:    the job label
     """
     method_name = "label"
-    return exec_nsdchat([module_name, job_name, method_name], p5_connection)
+    return submit_nsdchat([module_name, job_name, method_name],
+                          p5_connection, unwrap)
 
 
 def pending(as_object=False, p5_connection=None):
@@ -207,7 +207,6 @@ def pending(as_object=False, p5_connection=None):
         return resourcelist(result, Job, p5_connection)
 
 
-@onereturnvalue
 def protocol(job_name, archiveentry=None, p5_connection=None):
     """
     Syntax: Job <name> protocol [<archiveentry>]
@@ -218,11 +217,10 @@ def protocol(job_name, archiveentry=None, p5_connection=None):
     -On Success:    the requested protocol
     """
     method_name = "protocol"
-    return exec_nsdchat([module_name, job_name, method_name, archiveentry],
-                        p5_connection)
+    return submit_nsdchat([module_name, job_name, method_name, archiveentry],
+                          p5_connection, unwrap)
 
 
-@onereturnvalue
 def report(job_name, p5_connection=None):
     """
     Syntax: Job <name> report
@@ -232,10 +230,10 @@ def report(job_name, p5_connection=None):
     -On Success:    the report text
     """
     method_name = "report"
-    return exec_nsdchat([module_name, job_name, method_name], p5_connection)
+    return submit_nsdchat([module_name, job_name, method_name],
+                          p5_connection, unwrap)
 
 
-@onereturnvalue
 def resourcegroup(job_name, p5_connection=None):
     """
     Syntax: Job <name> resourcegroup
@@ -248,10 +246,10 @@ def resourcegroup(job_name, p5_connection=None):
                     if no resource group is associated with the job
     """
     method_name = "resourcegroup"
-    return exec_nsdchat([module_name, job_name, method_name], p5_connection)
+    return submit_nsdchat([module_name, job_name, method_name],
+                          p5_connection, unwrap)
 
 
-@onereturnvalue
 def resourcename(job_name, p5_connection=None):
     """
     Syntax: Job <name> resourcename
@@ -264,7 +262,8 @@ def resourcename(job_name, p5_connection=None):
                     if no resource group is associated with the job
     """
     method_name = "resourcename"
-    return exec_nsdchat([module_name, job_name, method_name], p5_connection)
+    return submit_nsdchat([module_name, job_name, method_name],
+                          p5_connection, unwrap)
 
 
 def running(as_object=False, p5_connection=None):
@@ -283,7 +282,6 @@ def running(as_object=False, p5_connection=None):
         return resourcelist(result, Job, p5_connection)
 
 
-@onereturnvalue
 def status(job_name, p5_connection=None):
     """
     Syntax: Job <name> status
@@ -305,7 +303,8 @@ def status(job_name, p5_connection=None):
     -On Success:    one of the supported statuses
     """
     method_name = "status"
-    return exec_nsdchat([module_name, job_name, method_name], p5_connection)
+    return submit_nsdchat([module_name, job_name, method_name],
+                          p5_connection, unwrap)
 
 
 def warning(lastdays=None, as_object=False, p5_connection=None):
@@ -431,7 +430,6 @@ class Job(P5Resource):
         else:
             return resourcelist(result, Job, p5_connection)
 
-    @onereturnvalue
     def completion(self):
         """
         Syntax: Job <name> completion
@@ -455,10 +453,9 @@ class Job(P5Resource):
         -On Success:    one of the completion codes
         """
         method_name = "completion"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return submit_nsdchat([module_name, self.name, method_name],
+                              self.p5_connection, unwrap)
 
-    @onereturnvalue
     def describe(self):
         """
         Syntax: Job <name> describe
@@ -468,8 +465,8 @@ class Job(P5Resource):
         -On Success:    the job description
         """
         method_name = "describe"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return submit_nsdchat([module_name, self.name, method_name],
+                              self.p5_connection, unwrap)
 
     def failed(lastdays=None, as_object=True, p5_connection=None):
         """
@@ -549,7 +546,6 @@ class Job(P5Resource):
                                                 method_name, outputfile,
                                                 options])
 
-    @onereturnvalue
     def label(self):
         """
         Syntax: Job <name> label
@@ -562,8 +558,8 @@ class Job(P5Resource):
         -On Success:    the job label
         """
         method_name = "label"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return submit_nsdchat([module_name, self.name, method_name],
+                              self.p5_connection, unwrap)
 
     def pending(as_object=True, p5_connection=None):
         """
@@ -582,7 +578,6 @@ class Job(P5Resource):
         else:
             return resourcelist(result, Job, p5_connection)
 
-    @onereturnvalue
     def protocol(self, archiveentry=None):
         """
         Syntax: Job <name> protocol [<archiveentry>]
@@ -593,10 +588,9 @@ class Job(P5Resource):
         -On Success:    the requested protocol
         """
         method_name = "protocol"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name, archiveentry])
+        return submit_nsdchat([module_name, self.name, method_name,
+                               archiveentry], self.p5_connection, unwrap)
 
-    @onereturnvalue
     def report(self):
         """
         Syntax: Job <name> report
@@ -606,10 +600,9 @@ class Job(P5Resource):
         -On Success:    the report text
         """
         method_name = "report"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return submit_nsdchat([module_name, self.name, method_name],
+                              self.p5_connection, unwrap)
 
-    @onereturnvalue
     def resourcegroup(self):
         """
         Syntax: Job <name> resourcegroup
@@ -622,10 +615,9 @@ class Job(P5Resource):
                         if no resource group is associated with the job
         """
         method_name = "resourcegroup"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return submit_nsdchat([module_name, self.name, method_name],
+                              self.p5_connection, unwrap)
 
-    @onereturnvalue
     def resourcename(self):
         """
         Syntax: Job <name> resourcename
@@ -638,8 +630,8 @@ class Job(P5Resource):
                         if no resource group is associated with the job
         """
         method_name = "resourcename"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return submit_nsdchat([module_name, self.name, method_name],
+                              self.p5_connection, unwrap)
 
     def running(as_object=True, p5_connection=None):
         """
@@ -656,7 +648,6 @@ class Job(P5Resource):
         else:
             return resourcelist(result, Job, p5_connection)
 
-    @onereturnvalue
     def status(self):
         """
         Syntax: Job <name> status
@@ -678,8 +669,8 @@ class Job(P5Resource):
         -On Success:    one of the supported statuses
         """
         method_name = "status"
-        return self.p5_connection.nsdchat_call([module_name, self.name,
-                                                method_name])
+        return submit_nsdchat([module_name, self.name, method_name],
+                              self.p5_connection, unwrap)
 
     def warning(lastdays=None, as_object=True, p5_connection=None):
         """
@@ -85,7 +85,7 @@ def label(jukebox_name, pool, slotid, as_object=False, p5_connection=None):
     Return values: 
     -On Success:    the job Id of the label job 
     """
-    method_name = "slotcount"
+    method_name = "label"
     result = exec_nsdchat([module_name, jukebox_name, method_name, pool,
                                   slotid], p5_connection)
     if not as_object:
@@ -196,29 +196,30 @@ class Jukebox(P5Resource):
         else:
             return resourcelist(result, Job, self.p5_connection)
 
-@onereturnvalue
-def label(self, pool, slotid, as_object=True):
-    """
-    Syntax: Jukebox <name> label <pool> <slotID1> [<slotID2> … [<slotIDx>]]
-    Description: Labels media in the given jukebox for the given POOL starting
-    with slotID1, optionally including all of the slotIDs given on the command
-    line. Example: Jukebox changer0  label My-Archive 1 5 9
-    this command will label the volumes in slots 1, 5 and 9 for pool MyArchive.
-    Note that only new/empty volumes can be labeled with this  command.
-    Use the Job .. commands to monitor the ongoing label job.
-    Return values: 
-    -On Success:    the job Id of the label job 
-    """
-    method_name = "slotcount"
-    result = self.p5_connection.nsdchat_call([module_name, self.name, 
-                                                     method_name, pool, slotid])
-    if not as_object:
-        return result
-    else:
-        return resourcelist(result, Job, p5_connection)
+    @onereturnvalue
+    def label(self, pool, slotid, as_object=True):
+        """
+        Syntax: Jukebox <name> label <pool> <slotID1>
+                [<slotID2> … [<slotIDx>]]
+        Description: Labels media in the given jukebox for the given POOL
+        starting with slotID1, optionally including all of the slotIDs given on
+        the command line. Example: Jukebox changer0  label My-Archive 1 5 9
+        this command will label the volumes in slots 1, 5 and 9 for pool
+        MyArchive. Note that only new/empty volumes can be labeled with this
+        command. Use the Job .. commands to monitor the ongoing label job.
+        Return values:
+        -On Success:    the job Id of the label job
+        """
+        method_name = "label"
+        result = self.p5_connection.nsdchat_call([module_name, self.name,
+                                                  method_name, pool, slotid])
+        if not as_object:
+            return result
+        else:
+            return resourcelist(result, Job, self.p5_connection)
 
     @onereturnvalue
-    def slotcount(jukebox_name):
+    def slotcount(self):
         """
         Syntax: Jukebox <name> slotcount 
         Description: Returns number of media slots in the given jukebox. The 
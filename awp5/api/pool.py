@@ -104,7 +104,7 @@ def enabled(pool_name, p5_connection=None):
     Return Values:
     -On Success:    the string “1" (enabled) or "0" (not enabled)
     """
-    method_name = "drivecount"
+    method_name = "enabled"
     return exec_nsdchat([module_name, pool_name, method_name], p5_connection)
 
 
@@ -367,7 +367,7 @@ def submit(server_name, now=False, as_object=False, p5_connection=None):
     Return Values:
     -On Success:    the backup job ID
     """
-    method_name = "reschedule"
+    method_name = "submit"
     now_option = "now"
     if now:
         now_option = now
@@ -471,7 +471,7 @@ class Server(P5Resource):
         -On Success:    the string "1" if deleted or "0" if not
         """
         method_name = "delete"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
     @onereturnvalue
@@ -483,7 +483,7 @@ class Server(P5Resource):
         -On Success:    the string "1" (disabled) or "0" (not disabled)
         """
         method_name = "disabled"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
     @onereturnvalue
@@ -495,7 +495,7 @@ class Server(P5Resource):
         -On Success:    the string “1" (enabled) or "0" (not enabled)
         """
         method_name = "enabled"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
     @onereturnvalue
@@ -508,7 +508,7 @@ class Server(P5Resource):
         -On Success:    the time in seconds (Posix time)
         """
         method_name = "lastbegin"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
     @onereturnvalue
@@ -523,7 +523,7 @@ class Server(P5Resource):
         -On Success:    the time in seconds (Posix time)
         """
         method_name = "lastend"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
     @onereturnvalue
@@ -537,7 +537,7 @@ class Server(P5Resource):
         -On Success:    the time in seconds (Posix time)
         """
         method_name = "nextrun"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
     @onereturnvalue
@@ -551,7 +551,7 @@ class Server(P5Resource):
         -On Success:    the template ID
         """
         method_name = "template"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
     @onereturnvalue
@@ -588,7 +588,7 @@ class Server(P5Resource):
         -On Success:    the throttle value in percent
         """
         method_name = "cputhrottle"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -602,7 +602,7 @@ class Server(P5Resource):
         -On Success:    the host name
         """
         method_name = "hostname"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -615,7 +615,7 @@ class Server(P5Resource):
         -On Success:    the string "0"
         """
         method_name = "disable"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
     @onereturnvalue
@@ -628,7 +628,7 @@ class Server(P5Resource):
         -On Success:    the string "1"
         """
         method_name = "enable"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
     @onereturnvalue
@@ -644,7 +644,7 @@ class Server(P5Resource):
         -On Success:    the boolean corresponding string "0" or "1"
         """
         method_name = "dataencryption"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -660,7 +660,7 @@ class Server(P5Resource):
         -On Success:    the boolean corresponding string "0" or "1"
         """
         method_name = "netencryption"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -675,7 +675,7 @@ class Server(P5Resource):
         -On Success:    the throttle value in percent
         """
         method_name = "netthrottle"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -706,7 +706,7 @@ class Server(P5Resource):
         -On Success:    list of paths separated by a single space
         """
         method_name = "pathlist"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -725,7 +725,7 @@ class Server(P5Resource):
         "1"     ping ok
         """
         method_name = "ping"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, timeout])
 
     @onereturnvalue
@@ -739,7 +739,7 @@ class Server(P5Resource):
         -On Success:    the port number
         """
         method_name = "port"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -755,7 +755,7 @@ class Server(P5Resource):
         -On Success:    the number of hours
         """
         method_name = "reschedule"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -771,11 +771,11 @@ class Server(P5Resource):
         Return Values:
         -On Success:    the backup job ID
         """
-        method_name = "reschedule"
+        method_name = "submit"
         now_option = "now"
         if now:
             now_option = now
-        result = self.p5_connection.nsdchat_call([modulname, self.name,
+        result = self.p5_connection.nsdchat_call([module_name, self.name,
                                                   method_name, now_option])
         if not as_object:
             return result
@@ -795,7 +795,7 @@ class Server(P5Resource):
         -On Success:    the boolean corresponding string "0" or "1"
         """
         method_name = "useevents"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -811,7 +811,7 @@ class Server(P5Resource):
         -On Success:    the boolean corresponding string "0" or "1"
         """
         method_name = "usecompression"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     @onereturnvalue
@@ -825,7 +825,7 @@ class Server(P5Resource):
         -On Success:    the user name
         """
         method_name = "username"
-        return self.p5_connection.nsdchat_call([modulname, self.name,
+        return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name, value])
 
     def __repr__(self):
@@ -567,7 +567,7 @@ class Volume(P5Resource):
         Return Values:
         -On Success:    the job list
         """
-        method_name = "isonline"
+        method_name = "jobs"
         return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
@@ -215,7 +215,7 @@ def totalfiles(workstation_name, p5_connection=None):
     Return Values:
     -On Success:    the number of files
     """
-    method_name = "peerip"
+    method_name = "totalfiles"
     return exec_nsdchat([module_name, workstation_name, method_name],
                         p5_connection)
 
@@ -229,7 +229,7 @@ def totalkbytes(workstation_name, p5_connection=None):
     Return Values:
     -On Success:    the number of KBytes
     """
-    method_name = "peerip"
+    method_name = "totalkbytes"
     return exec_nsdchat([module_name, workstation_name, method_name],
                         p5_connection)
 
@@ -242,7 +242,7 @@ def retaintime(workstation_name, p5_connection=None):
     Return Values:
     -On Success:    the retention time in seconds
     """
-    method_name = "peerip"
+    method_name = "retaintime"
     return exec_nsdchat([module_name, workstation_name, method_name],
                         p5_connection)
 
@@ -518,7 +518,7 @@ class Workstation(P5Resource):
         Return Values:
         -On Success:    the number of files
         """
-        method_name = "peerip"
+        method_name = "totalfiles"
         return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
@@ -531,7 +531,7 @@ class Workstation(P5Resource):
         Return Values:
         -On Success:    the number of KBytes
         """
-        method_name = "peerip"
+        method_name = "totalkbytes"
         return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
@@ -544,7 +544,7 @@ class Workstation(P5Resource):
         Return Values:
         -On Success:    the retention time in seconds
         """
-        method_name = "peerip"
+        method_name = "retaintime"
         return self.p5_connection.nsdchat_call([module_name, self.name,
                                                 method_name])
 
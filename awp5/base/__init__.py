@@ -5,4 +5,4 @@
 # information.
 # ---------------
 
-__all__ = ["config", "connection"]
+__all__ = ["config", "connection", "statcache"]
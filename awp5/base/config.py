@@ -27,7 +27,14 @@ The Port-Number as in config/lexxsrv.xxxx. The value will be incrementet by
 
 p5_path = r'C:\Program Files\ARCHIWARE\Data_Lifecycle_Management_Suite'
 """The Filepath to the Archiware P5 Installation Directory."""
+
 if sys.platform == 'win32':
     p5_path = r'C:\Program Files\ARCHIWARE\Data_Lifecycle_Management_Suite'
 elif sys.platform == 'darwin' or sys.platform.startswith('linux'):
     p5_path = r'/usr/local/aw'
+
+pool_size = 32
+"""
+The number of idle Connection objects (and so P5 sessions) kept per server
+and user for reuse by concurrent callers.
+"""
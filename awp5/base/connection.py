@@ -8,6 +8,7 @@
 """
 Use the Connection class for accessing the nsdchat commandline.
 """
+import asyncio
 import hashlib
 import time
 import sys
@@ -16,8 +17,13 @@ import errno
 import logging
 import os
 import locale
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
 from awp5.base import config
 from awp5.base.helpers import strings, defaultIfNotSet, singlevalue
+from awp5.base.helpers import unwrap
 
 
 class ConnectionBase(object):
@@ -61,7 +67,11 @@ class Connection(ConnectionBase):
     applications.
     """
     logger = logging.getLogger('awp5')
-    
+
+    batch_size = 16
+    """
+    the maximum number of nsdchat processes 'nsdchat_batch' runs at once.
+    """
 
     def __init__(self, p5_user=None, p5_pass=None,
                  p5_ip=None, p5_port_nr=None,
@@ -73,12 +83,19 @@ class Connection(ConnectionBase):
                          defaultIfNotSet(p5_path, config.p5_path))
         self.debugMsg = False
         self.connection_string = None
+        self.nsdchat_argv = None
         self.session_id = None
         self.timeout = 10
+        self._busy = threading.Lock()
+        # the Connection a pooled sibling stands in for
+        self._owner = None
 
         if not self.session_id:
+            # siblings are created in quick succession, so the time alone
+            # may not tell their sessions apart
             self.session_id = "_".join(["awp5", hashlib.sha224(str(time.time())
                                                                .encode('utf-8')
+                                                               + os.urandom(8)
                                                                ).hexdigest()])
         else:
             self.session_id = sessionid
@@ -102,13 +119,15 @@ class Connection(ConnectionBase):
         """
         tries to connect to the P5 Server and returns True if the server is
         available and runs at least the given 'version'. False if version is
-        lower.
+        lower or if the server answered with an error.
         If no connection could be made the nsdchat executable does timeout and
         a 'subprocess.TimeoutExpired' execption will be raised.
         """
         p5cmd = ['srvinfo', 'lexxvers']
         try:
             res = self.nsdchat_call(p5cmd,5)
+            if res is None:
+                return False
             p5_version = singlevalue(res)
             if (p5_version >= str(version)):
                 return True
@@ -151,28 +170,114 @@ class Connection(ConnectionBase):
     def nsdchat_call(self, cmd, timeout=None):
         if not timeout:
             timeout = self.timeout
-        nsdcmd = [self.nsdchat, '-s', self.getConnectionString(), '-c']
-        c = nsdcmd + strings(cmd)
-        process = subprocess.Popen(
-            c, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        process = self._spawn(cmd)
+        return self._collect(process, cmd, timeout)
+
+    def nsdchat_batch(self, cmds, timeout=None):
+        """
+        Executes the nsdchat commands in 'cmds' and returns the list of their
+        results in the same order. Up to 'batch_size' nsdchat processes are
+        started before waiting for the first one, so the round-trips to the
+        P5 server overlap instead of adding up. Only the first command of
+        each window runs on this connection, the others on idle sibling
+        Connections of connection_pool, so every concurrent nsdchat has a
+        session of its own and errors are queried from the failed one.
+        """
+        if not timeout:
+            timeout = self.timeout
+        cmds = list(cmds)
+        results = []
+        for start in range(0, len(cmds), self.batch_size):
+            window = cmds[start:start + self.batch_size]
+            connections = [self] + [connection_pool.sibling(self)
+                                    for _ in window[1:]]
+            processes = []
+            failed = True
+            try:
+                for connection, cmd in zip(connections, window):
+                    processes.append(connection._spawn(cmd))
+                for connection, process, cmd in zip(connections, processes,
+                                                    window):
+                    results.append(connection._collect(process, cmd,
+                                                       timeout))
+                failed = False
+            finally:
+                for process in processes:
+                    if process.returncode is None:
+                        process.kill()
+                        process.wait()
+                for connection in connections[1:]:
+                    connection_pool.release(connection, self, failed)
+        return results
+
+    async def nsdchat_call_async(self, cmd, timeout=None):
+        """
+        Coroutine variant of nsdchat_call running nsdchat as asyncio
+        subprocess, so many calls can wait for the P5 server at once without
+        a thread each. Raises asyncio.TimeoutError if nsdchat does not finish
+        within 'timeout' seconds.
+        """
+        if not timeout:
+            timeout = self.timeout
+        process = await asyncio.create_subprocess_exec(
+            *self._argv(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            out, err = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        if self._failed(process.returncode, out):
+            # geterror runs nsdchat synchronously, keep it off the loop
+            error = await asyncio.get_running_loop().run_in_executor(
+                None, self.geterror)
+            self._log_error(cmd, error)
+            return None
+        return self._result(process.returncode, out, cmd)
+
+    def _argv(self, cmd):
+        # nsdchat takes the command as separate argv words and answers with
+        # a single text line; there is no wire protocol on our side to frame
+        if not self.nsdchat_argv:
+            self.nsdchat_argv = [self.nsdchat, '-s',
+                                 self.getConnectionString(), '-c']
+        return self.nsdchat_argv + strings(cmd)
+
+    def _spawn(self, cmd):
+        return subprocess.Popen(
+            self._argv(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _collect(self, process, cmd, timeout):
         try:
             out, err = process.communicate(timeout=timeout)
         except subprocess.TimeoutExpired:
             process.kill()
             raise
-        if (process.returncode != 0 and out.strip() == ''):
-            Connection.logger.error("P5 error while executing '{}'".format(cmd))
-            Connection.logger.error(self.geterror())
+        return self._result(process.returncode, out, cmd)
+
+    def _failed(self, returncode, out):
+        return returncode != 0 and out.strip() == b''
+
+    def _log_error(self, cmd, error):
+        Connection.logger.error("P5 error while executing '{}'".format(cmd))
+        Connection.logger.error(error)
+
+    def _result(self, returncode, out, cmd):
+        if self._failed(returncode, out):
+            self._log_error(cmd, self.geterror())
             return None
         try:
             res = out.decode('utf-8').strip().split(' ')
         except UnicodeDecodeError:
             res = out.decode(locale.getpreferredencoding()).strip().split(' ')
-        Connection.last_connection = self
+        # a pooled sibling and its session are not the caller's to reuse
+        Connection.last_connection = self._owner or self
         return res
 
 
 class P5Resource(object):
+    __slots__ = ('name', 'p5_connection')
+
     def __init__(self, name, p5_connection):
         self.name = name
         if not p5_connection:
@@ -200,8 +305,371 @@ class P5Resource(object):
         else:
             raise TypeError("other must be a str or {} instance"
                              "".format(type(self)))
-            
-def exec_nsdchat(cmd, p5_connection=None):
+
+
+class ConnectionPool(object):
+    """
+    Keeps idle Connection objects per P5 server and user for reuse.
+    A Connection is handed out as long as no other thread is executing a
+    command on it. Concurrent callers borrow an idle sibling Connection with
+    the same settings (and its own session id) instead, which is created only
+    if no idle one is left.
+    At most 'maxsize' idle siblings are kept per server and user, the
+    default is config.pool_size. Siblings idle for more than 'idle_ttl'
+    seconds are dropped instead of reusing a session the P5 server may have
+    expired, and a sibling whose command failed is not kept.
+    """
+
+    def __init__(self, maxsize=None, idle_ttl=60):
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(p5_connection):
+        return (p5_connection.p5_ip, p5_connection.p5_port_nr,
+                p5_connection.p5_user, p5_connection.p5_path)
+
+    def acquire(self, p5_connection):
+        if p5_connection._busy.acquire(blocking=False):
+            return p5_connection
+        return self.sibling(p5_connection)
+
+    def sibling(self, p5_connection):
+        """
+        Hands out an idle sibling of 'p5_connection' (never 'p5_connection'
+        itself), creating one if none is left. Give it back with release.
+        """
+        key = ConnectionPool._key(p5_connection)
+        expired = time.monotonic() - self.idle_ttl
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                sibling, released = idle.pop()
+                if released < expired:
+                    # the others have been idle even longer
+                    idle.clear()
+                elif sibling._busy.acquire(blocking=False):
+                    sibling._owner = p5_connection
+                    return sibling
+        sibling = Connection(p5_connection.p5_user, p5_connection.p5_pass,
+                             p5_connection.p5_ip, p5_connection.p5_port_nr,
+                             p5_connection.p5_path)
+        sibling.timeout = p5_connection.timeout
+        sibling._busy.acquire()
+        sibling._owner = p5_connection
+        return sibling
+
+    def release(self, connection, p5_connection, failed=False):
+        connection._busy.release()
+        if connection is p5_connection or failed:
+            return
+        key = ConnectionPool._key(p5_connection)
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            if len(idle) < defaultIfNotSet(self.maxsize, config.pool_size):
+                idle.append((connection, time.monotonic()))
+
+    @contextmanager
+    def borrow(self, p5_connection=None):
+        if not p5_connection:
+            p5_connection = Connection.get()
+        connection = self.acquire(p5_connection)
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, p5_connection, failed=True)
+            raise
+        self.release(connection, p5_connection)
+
+    @contextmanager
+    def hold(self, p5_connection=None):
+        # like borrow, but waits for 'p5_connection' itself to become idle
+        # instead of handing out a sibling with a session of its own
+        if not p5_connection:
+            p5_connection = Connection.get()
+        with p5_connection._busy:
+            yield p5_connection
+
+
+connection_pool = ConnectionPool()
+
+
+def borrow(p5_connection=None):
+    """
+    Context manager yielding a Connection with the settings of
+    'p5_connection' (or the default connection) that is not in use by any
+    other thread.
+    """
+    return connection_pool.borrow(p5_connection)
+
+
+def hold(p5_connection=None):
+    """
+    Context manager yielding 'p5_connection' (or the default connection)
+    itself once no other thread is executing a command on it. Use it for
+    commands bound to its P5 session, e.g. on a temporary resource like an
+    ArchiveSelection, which is only known to the session that created it.
+    """
+    return connection_pool.hold(p5_connection)
+
+
+def exec_nsdchat(cmd, p5_connection=None, bound=False):
+    """
+    Executes the nsdchat command 'cmd' on a Connection borrowed for
+    'p5_connection', or with 'bound' set on the session of 'p5_connection'
+    itself (see hold).
+    """
+    with (hold if bound else borrow)(p5_connection) as connection:
+        return connection.nsdchat_call(cmd)
+
+
+def exec_nsdchat_batch(cmds, p5_connection=None, bound=False):
+    """
+    Executes the nsdchat commands 'cmds' with Connection.nsdchat_batch and
+    returns their results. With 'bound' set they are instead executed one
+    after another, in order, on the session of 'p5_connection' itself (see
+    hold), as concurrent commands run on sessions of their own.
+    """
+    if bound:
+        with hold(p5_connection) as connection:
+            return [connection.nsdchat_call(cmd) for cmd in cmds]
+    with borrow(p5_connection) as connection:
+        return connection.nsdchat_batch(cmds)
+
+
+def exec_nsdchat_fields(module_name, resource_names, fields,
+                        p5_connection=None):
+    """
+    Queries the methods 'fields' (which take no arguments) of each of the
+    'module_name' resources 'resource_names' with one batch of nsdchat calls
+    instead of one call after the other.
+    Returns a dict mapping each resource name to a dict of the field names
+    and their unwrapped values, None for a failed query.
+    """
+    resource_names = [str(name) for name in resource_names]
+    cmds = [(module_name, name, field) for name in resource_names
+            for field in fields]
+    results = iter(exec_nsdchat_batch(cmds, p5_connection))
+    values = {}
+    for name in resource_names:
+        values[name] = {}
+        for field in fields:
+            result = next(results)
+            values[name][field] = None if result is None else unwrap(result)
+    return values
+
+
+async def async_exec_nsdchat(cmd, p5_connection=None):
+    """
+    Coroutine variant of exec_nsdchat. Concurrently awaited calls each use
+    their own pooled Connection.
+    """
     if not p5_connection:
         p5_connection = Connection.get()
-    return p5_connection.nsdchat_call(cmd)
+    connection = connection_pool.acquire(p5_connection)
+    try:
+        result = await connection.nsdchat_call_async(cmd)
+    except BaseException:
+        connection_pool.release(connection, p5_connection, failed=True)
+        raise
+    connection_pool.release(connection, p5_connection)
+    return result
+
+
+# the running async_query_nsdchat calls by event loop, connection and command
+_inflight = {}
+
+
+async def async_query_nsdchat(cmd, p5_connection=None):
+    """
+    Coroutine variant of exec_nsdchat for read-only queries. While the same
+    query for the same P5 server and user is already running in this event
+    loop, its result is awaited instead of running the query again.
+    """
+    if not p5_connection:
+        p5_connection = Connection.get()
+    key = (asyncio.get_running_loop(), ConnectionPool._key(p5_connection)) + \
+        tuple(strings(cmd))
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(async_exec_nsdchat(cmd, p5_connection))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    result = await asyncio.shield(task)
+    if result is None:
+        return None
+    return list(result)
+
+
+_batches = threading.local()
+
+
+class Batch(object):
+    """
+    Collects nsdchat commands and executes them together with
+    'nsdchat_batch' when the with block is left, so their round-trips to
+    the P5 server overlap. 'submit' returns a concurrent.futures.Future
+    holding the result once the batch has been executed.
+    Operations supporting batches (see submit_nsdchat) queue their command
+    in the innermost active batch of the current thread instead of
+    executing it at once.
+    A command may contain the Future of an earlier command of the same
+    batch as argument, e.g. a job id returned by a queued submit. Such a
+    command is executed after the command it depends on, with the Future
+    replaced by its result. If that command failed, the dependent command
+    is skipped and its result is None as well.
+    Commands submitted with 'bound' set run one after another, in the
+    order they were queued, on the session of the batch's connection
+    itself, after the others (see exec_nsdchat_batch).
+    If 'depth' is given, the queued commands are already executed whenever
+    'depth' of them are pending, so a long running with block keeps a
+    bounded number of commands in flight and its Futures resolve while it
+    is still filled.
+    """
+
+    def __init__(self, p5_connection=None, depth=None):
+        self.p5_connection = p5_connection
+        self.depth = depth
+        self._queued = []
+
+    def submit(self, cmd, transform=None, bound=False):
+        """
+        Queues 'cmd' and returns the Future of its result. If given,
+        'transform' is applied to a successful result.
+        """
+        future = Future()
+        self._queued.append((cmd, transform, future, bound))
+        if self.depth and len(self._queued) >= self.depth:
+            self.flush()
+        return future
+
+    def flush(self):
+        queued, self._queued = self._queued, []
+        ready = []
+        try:
+            while queued:
+                ready = [entry for entry in queued if not _pending(entry[0])]
+                if not ready:
+                    raise ValueError("batched commands depend on results "
+                                     "which are not part of the batch")
+                queued = [entry for entry in queued if _pending(entry[0])]
+                self._execute(ready)
+        except Exception as exc:
+            for _, _, future, _ in ready + queued:
+                if not future.done():
+                    future.set_exception(exc)
+            raise
+
+    def _execute(self, entries):
+        cmds = [_resolved(cmd) for cmd, _, _, _ in entries]
+        results = [None] * len(entries)
+        for bound in (False, True):
+            runnable = [index for index, (entry, cmd) in
+                        enumerate(zip(entries, cmds))
+                        if cmd is not None and entry[3] is bound]
+            if not runnable:
+                continue
+            for index, result in zip(runnable, exec_nsdchat_batch(
+                    [cmds[index] for index in runnable], self.p5_connection,
+                    bound)):
+                results[index] = result
+        for (cmd, transform, future, _), resolved, result in \
+                zip(entries, cmds, results):
+            if resolved is None:
+                Connection.logger.error("Skipped '{}', a command it depends "
+                                        "on failed".format(cmd))
+                future.set_result(None)
+                continue
+            if transform and result is not None:
+                result = transform(result)
+            future.set_result(result)
+
+    def __enter__(self):
+        if not hasattr(_batches, 'stack'):
+            _batches.stack = []
+        _batches.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _batches.stack.remove(self)
+        if exc_type is None:
+            self.flush()
+        else:
+            for _, _, future, _ in self._queued:
+                future.cancel()
+            self._queued = []
+        return False
+
+
+def _pending(cmd):
+    for arg in cmd:
+        if isinstance(arg, Future) and not arg.done():
+            return True
+        if type(arg) in (list, tuple) and _pending(arg):
+            return True
+    return False
+
+
+def _resolved(cmd):
+    # replaces the Futures in 'cmd' by their results, None if one failed
+    resolved = []
+    for arg in cmd:
+        if isinstance(arg, Future) or type(arg) in (list, tuple):
+            arg = arg.result() if isinstance(arg, Future) else _resolved(arg)
+            if arg is None:
+                return None
+        resolved.append(arg)
+    return resolved
+
+
+def batch(p5_connection=None):
+    """
+    Returns a Batch for the commands executed with 'p5_connection' (or the
+    default connection, if None), see Batch.
+    """
+    return Batch(p5_connection)
+
+
+def active_batch():
+    """
+    Returns the innermost Batch entered in the current thread or None.
+    """
+    stack = getattr(_batches, 'stack', None)
+    if stack:
+        return stack[-1]
+    return None
+
+
+def batch_for(p5_connection=None):
+    """
+    Returns the innermost Batch entered in the current thread if it is a
+    batch for 'p5_connection' (None stands for the default connection),
+    otherwise None.
+    """
+    current = active_batch()
+    if current is None or current.p5_connection is p5_connection:
+        return current
+    if (current.p5_connection or Connection.get()) is \
+            (p5_connection or Connection.get()):
+        return current
+    return None
+
+
+def submit_nsdchat(cmd, p5_connection=None, transform=None, bound=False):
+    """
+    Executes 'cmd' like exec_nsdchat (on the session of 'p5_connection'
+    itself if 'bound' is set) and returns the result, passed through
+    'transform' if given and successful.
+    While a Batch for the same 'p5_connection' is active in the current
+    thread the command is queued in it instead and the Future of the result
+    is returned.
+    """
+    current = batch_for(p5_connection)
+    if current:
+        return current.submit(cmd, transform, bound)
+    result = exec_nsdchat(cmd, p5_connection, bound)
+    if transform and result is not None:
+        return transform(result)
+    return result
@@ -6,22 +6,200 @@
 # ---------------
 
 import functools
+import mmap
+import os
+import re
+import time
+
+_ELEMENT = re.compile(r'\{(?:[^{}\\]|\\.)*\}|\S+')
+# backslash escapes for the curly braces and backslashes inside a brace
+# quoted word
+_BRACE_ESCAPES = str.maketrans({"{": "\\{", "}": "\\}", "\\": "\\\\"})
+# what nsdchat returns instead of a resource name if there is none
+_NO_RESOURCE = frozenset(("<empty>", "unknown"))
+
+
+def elements(input_list):
+    """
+    Regroups the blank separated nsdchat output into its list elements, so a
+    name containing blanks, which P5 encloses in curly braces, stays one
+    element. The braces are kept, the element can be passed on to nsdchat
+    as it is.
+    """
+    if not any("{" in entry for entry in input_list):
+        return input_list
+    return _ELEMENT.findall(" ".join(input_list))
+
+
+def bracequote(word):
+    """
+    Returns 'word' (e.g. a path) the way nsdchat expects it as a single
+    argument: if it contains blanks, curly braces or backslashes, the braces
+    and backslashes are escaped with a backslash and the word is enclosed in
+    curly braces. Other words are returned as they are.
+    """
+    if " " in word or "{" in word or "}" in word or "\\" in word:
+        return "{" + word.translate(_BRACE_ESCAPES) + "}"
+    return word
 
 
 def resourcelist(input_list, resource_class, p5connection):
-    result_list = []
-    if len(input_list):
-        for entry in input_list:
-            if entry !="<empty>" and entry !="unknown":
-                result_list.append(resource_class(entry, p5connection))
-    return result_list
+    return [resource_class(entry, p5connection)
+            for entry in elements(input_list or ())
+            if entry not in _NO_RESOURCE]
+
+
+def resource(input_list, resource_class, p5connection):
+    """
+    The unwrapped resourcelist: the single resource object named by the
+    nsdchat result, or the list of objects if it names several. A result of
+    one word (the usual single handle or name) is turned into its object
+    directly, without building the intermediate list.
+    """
+    if input_list and len(input_list) == 1:
+        if input_list[0] in _NO_RESOURCE:
+            return []
+        return resource_class(input_list[0], p5connection)
+    return unwrap(resourcelist(input_list, resource_class, p5connection))
+
+
+def resourceiter(input_list, resource_class, p5connection):
+    """
+    Lazy variant of resourcelist yielding the resource objects one by one.
+    """
+    for entry in elements(input_list or ()):
+        if entry not in _NO_RESOURCE:
+            yield resource_class(entry, p5connection)
+
+
+class LazyResourceList(list):
+    """
+    List of the resource objects resourcelist would return, but each object
+    is only created when it is accessed for the first time. Until then the
+    list holds its name, which compares equal to the object (see
+    P5Resource.__eq__).
+    """
+    __slots__ = ('_resource_class', '_p5connection')
+
+    def __init__(self, input_list, resource_class, p5connection):
+        super().__init__(entry for entry in elements(input_list or ())
+                         if entry not in _NO_RESOURCE)
+        self._resource_class = resource_class
+        self._p5connection = p5connection
+
+    def _resolve(self, index):
+        # the object at 'index', created in place of its name if needed
+        entry = list.__getitem__(self, index)
+        if isinstance(entry, str):
+            entry = self._resource_class(entry, self._p5connection)
+            list.__setitem__(self, index, entry)
+        return entry
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._resolve(i) for i in range(*index.indices(len(self)))]
+        return self._resolve(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._resolve(index)
+
+    def __reversed__(self):
+        for index in reversed(range(len(self))):
+            yield self._resolve(index)
+
+    def pop(self, index=-1):
+        entry = self._resolve(index)
+        list.pop(self, index)
+        return entry
+
+    def copy(self):
+        return list(self)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __mul__(self, count):
+        return list(self) * count
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def outputfile_path(outputfile):
+    """
+    Returns the local path of an nsdchat <output file> argument in the form
+    ?client:?absolute_path, or None if the file is written on another client.
+    """
+    client, sep, path = outputfile.partition(":")
+    if not sep or not path.startswith("/"):
+        return outputfile
+    if client == "localhost":
+        return path
+    return None
+
+
+def follow_rows(path, future, chunk_size=65536, poll_interval=0.5):
+    """
+    Yields the TAB separated records of the file 'path' as tuples while it is
+    still being written, until 'future' (the pending nsdchat call writing it)
+    is done and the file has been read completely.
+    Raises the exception of 'future', if any.
+    """
+    while not os.path.exists(path):
+        if future.done():
+            future.result()
+            return
+        time.sleep(poll_interval)
+    with open(path, "rb") as output:
+        pending = b""
+        while True:
+            finished = future.done()
+            chunk = output.read(chunk_size)
+            if chunk:
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                for line in lines:
+                    yield tuple(line.decode("utf-8", "replace").split("\t"))
+            elif finished:
+                break
+            else:
+                time.sleep(poll_interval)
+        if pending:
+            yield tuple(pending.decode("utf-8", "replace").split("\t"))
+    future.result()
+
+
+def read_rows(path):
+    """
+    Yields the TAB separated records of the file 'path' as tuples. The file
+    is memory mapped instead of being read into memory as a whole.
+    """
+    with open(path, "rb") as output:
+        if not os.fstat(output.fileno()).st_size:
+            return
+        with mmap.mmap(output.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            end = data.find(b"\n", start)
+            while end != -1:
+                yield tuple(data[start:end].decode("utf-8", "replace")
+                            .split("\t"))
+                start = end + 1
+                end = data.find(b"\n", start)
+            if start < len(data):
+                yield tuple(data[start:].decode("utf-8", "replace")
+                            .split("\t"))
 
 
 def strings(input_list):
     result=[]
     for entry in input_list:
         if entry:
-            if type(entry) != list:
+            if type(entry) is str:
+                result.append(entry)
+            elif type(entry) not in (list, tuple):
                 result.append("{}".format(entry))
             else:
                 result.extend(strings(entry))
@@ -46,22 +224,25 @@ def defaultIfNotSet(val, default):
 
 
 def onereturnvalue(func):
+    """
+    Unwraps single value results: a one element list is returned as its
+    element and a list of several strings as one blank separated string.
+    Any other result is returned unchanged.
+    """
     @functools.wraps(func)
     def wrapper_return_first_value(*args, **kwargs):
-        result = func(*args, **kwargs)
-        if result:
-            no_of_values = len(result)
-            if no_of_values == 0:
-                return ""
-            if no_of_values == 1:
-                return result[0]
-            if no_of_values > 1:
-                nonstringvaluepresent = False
-                for val in result:
-                    if type(val) != str:
-                        nonstringvaluepresent = True
-                if not nonstringvaluepresent:
-                    result = " ".join(result)
-                    return result
-        return result
+        return unwrap(func(*args, **kwargs))
     return wrapper_return_first_value
+
+
+def unwrap(result):
+    """
+    The unwrapping of onereturnvalue, for results computed later (e.g. in a
+    Batch).
+    """
+    if type(result) is list:
+        if len(result) == 1:
+            return result[0]
+        if result and all(type(val) is str for val in result):
+            return " ".join(result)
+    return result
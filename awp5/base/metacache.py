@@ -0,0 +1,185 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Caches results of P5 queries that rarely change (like the names of the
+configured resources) for a short time, so repeated queries do not cost a
+round-trip to the P5 server each.
+Entries are keyed by the P5 server and user of the connection and the words
+of the nsdchat command. Operations changing the queried data invalidate the
+affected entries by command prefix.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from awp5.base.connection import Connection, ConnectionPool, batch_for
+from awp5.base.connection import exec_nsdchat
+from awp5.base.helpers import strings
+
+
+class TTLCache(object):
+    """
+    Thread-safe mapping whose entries expire 'ttl' seconds (or the 'ttl'
+    given to set) after they have been set. If more than 'maxsize' entries
+    are stored, the least recently used ones are dropped.
+    A value fetched while an invalidate of its key was going on is stale:
+    set with the 'since' token taken (see token) before the fetch ignores
+    it if its key has been invalidated after the token was taken.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # the recent invalidate prefixes and their stamps; tokens older
+        # than _floor predate the prefixes dropped from it
+        self._stamp = 0
+        self._floor = 0
+        self._invalidated = OrderedDict()
+
+    def token(self):
+        with self._lock:
+            return self._stamp
+
+    def _stale(self, key, since):
+        if since < self._floor:
+            return True
+        for prefix, stamp in reversed(self._invalidated.items()):
+            if stamp <= since:
+                return False
+            if key[:len(prefix)] == prefix:
+                return True
+        return False
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None, since=None):
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            if since is not None and self._stale(key, since):
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, prefix):
+        """
+        Drops all entries whose key starts with the tuple 'prefix'.
+        """
+        with self._lock:
+            for key in [key for key in self._entries
+                        if key[:len(prefix)] == prefix]:
+                del self._entries[key]
+            self._stamp += 1
+            self._invalidated.pop(prefix, None)
+            self._invalidated[prefix] = self._stamp
+            if len(self._invalidated) > self.maxsize:
+                self._floor = self._invalidated.popitem(last=False)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = TTLCache()
+
+
+def key(p5_connection, cmd):
+    if not p5_connection:
+        p5_connection = Connection.get()
+    return (ConnectionPool._key(p5_connection),) + tuple(strings(cmd))
+
+
+def store(cache_key, result, ttl=None, since=None):
+    """
+    Caches 'result' under 'cache_key' unless the query failed (None), for
+    'ttl' seconds if given instead of the cache default. If 'since' is the
+    cache token taken before the query was sent, the result is not cached if
+    'cache_key' has been invalidated in the meantime. Returns 'result'.
+    """
+    if result is not None:
+        cache.set(cache_key, list(result), ttl, since)
+    return result
+
+
+def cached(cmd, fetch, p5_connection=None, bypass_cache=False, ttl=None):
+    """
+    Returns the cached result of the nsdchat command 'cmd'. If it is not
+    cached (or 'bypass_cache' is set), fetch() is called and its result is
+    cached, for 'ttl' seconds if given.
+    """
+    cache_key = key(p5_connection, cmd)
+    if not bypass_cache:
+        result = cache.get(cache_key)
+        if result is not None:
+            return list(result)
+    since = cache.token()
+    return store(cache_key, fetch(), ttl, since)
+
+
+def submit_cached(cmd, p5_connection=None, transform=None,
+                  bypass_cache=False, ttl=None, bound=False):
+    """
+    Like awp5.base.connection.submit_nsdchat, but the result of 'cmd' is
+    taken from the cache if possible and cached otherwise. Inside a Batch the
+    command is queued and its result is cached once the batch has been
+    executed.
+    """
+    cache_key = key(p5_connection, cmd)
+    batch = batch_for(p5_connection)
+    if batch:
+        since = cache.token()
+        if transform:
+            return batch.submit(
+                cmd, lambda result: transform(store(cache_key, result, ttl,
+                                                    since)), bound)
+        return batch.submit(cmd, functools.partial(store, cache_key,
+                                                   ttl=ttl, since=since),
+                            bound)
+    result = cached(cmd, lambda: exec_nsdchat(cmd, p5_connection, bound),
+                    p5_connection, bypass_cache, ttl)
+    if transform and result is not None:
+        return transform(result)
+    return result
+
+
+def invalidate(cmd_prefix, p5_connection=None):
+    """
+    Drops the cached results of all nsdchat commands starting with the words
+    in 'cmd_prefix'.
+    """
+    cache.invalidate(key(p5_connection, cmd_prefix))
+
+
+def invalidating(cmd_prefix, p5_connection=None, transform=None):
+    """
+    Returns a submit_nsdchat transform for a command changing the results of
+    the nsdchat commands starting with the words in 'cmd_prefix': once it
+    has completed, their cached results are dropped (see invalidate) and
+    'transform' is applied if given. Dropping them before the command runs
+    is not enough, a concurrent query (or one in the same Batch) could cache
+    the old value again in the meantime.
+    """
+    def invalidated(result):
+        invalidate(cmd_prefix, p5_connection)
+        if transform:
+            return transform(result)
+        return result
+    return invalidated
@@ -0,0 +1,25 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Runs independent P5 queries concurrently.
+Each nsdchat call waits for the P5 server most of the time, so threads are
+enough to overlap the waits. Calls made through exec_nsdchat borrow their own
+pooled Connection per thread (see awp5.base.connection.ConnectionPool).
+Only use these helpers for read-only queries; changing the same resource from
+several threads at once is not safe.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+
+def pmap(fn, args, workers=8):
+    """
+    Returns the list of fn(arg) for each arg in 'args', in the same order,
+    computed by up to 'workers' threads.
+    """
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(fn, args))
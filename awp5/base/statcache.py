@@ -0,0 +1,116 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Caches the os.stat results of local paths while a selection is being built,
+so client-side helpers inspecting the same path more than once (exists,
+is it a directory, has it changed) cost one stat call instead of one each:
+
+    with awp5.stat_cache():
+        selection.add_delta(paths, statefile)
+
+Outside of a with block the functions of this module just call os.stat.
+Submitting an ArchiveSelection drops the cached results.
+"""
+import os
+import stat as stat_module
+import threading
+
+_caches = threading.local()
+
+
+class StatCache(object):
+    """
+    Memoizes os.stat and os.lstat by absolute path. Entering it makes it the
+    cache used by the functions of this module in the current thread.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lstats = {}
+
+    def stat(self, path):
+        return self._lookup(self._stats, os.stat, path)
+
+    def lstat(self, path):
+        return self._lookup(self._lstats, os.lstat, path)
+
+    def _lookup(self, results, call, path):
+        path = os.path.abspath(path)
+        result = results.get(path)
+        if result is None:
+            result = results[path] = call(path)
+        return result
+
+    def clear(self):
+        self._stats.clear()
+        self._lstats.clear()
+
+    def __enter__(self):
+        if not hasattr(_caches, 'stack'):
+            _caches.stack = []
+        _caches.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _caches.stack.remove(self)
+        return False
+
+
+def stat_cache():
+    """
+    Returns a new StatCache to be used as context manager, see StatCache.
+    """
+    return StatCache()
+
+
+def active_cache():
+    """
+    Returns the innermost StatCache entered in the current thread or None.
+    """
+    stack = getattr(_caches, 'stack', None)
+    if stack:
+        return stack[-1]
+    return None
+
+
+def stat(path):
+    cache = active_cache()
+    return cache.stat(path) if cache else os.stat(path)
+
+
+def lstat(path):
+    cache = active_cache()
+    return cache.lstat(path) if cache else os.lstat(path)
+
+
+def exists(path):
+    try:
+        stat(path)
+    except OSError:
+        return False
+    return True
+
+
+def is_dir(path):
+    """
+    True if <path> is a directory (not following a symbolic link), the
+    choice between adddirectory and addfile.
+    """
+    try:
+        return stat_module.S_ISDIR(lstat(path).st_mode)
+    except OSError:
+        return False
+
+
+def invalidate():
+    """
+    Drops the results of the active StatCache, if any.
+    """
+    cache = active_cache()
+    if cache:
+        cache.clear()
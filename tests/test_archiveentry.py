@@ -0,0 +1,55 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Checks that an ArchiveEntry does not keep the invalid values it returns
+before the entry has been archived.
+"""
+import unittest
+from unittest import mock
+from awp5.base.connection import Connection
+from awp5.api import archiveentry
+from awp5.api.archiveentry import ArchiveEntry
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        self.entry = ArchiveEntry("h", self.connection)
+        self.values = {"status": ["unknown"], "btime": ["0"]}
+
+    def call(self, cmd):
+        return list(self.values[cmd[2]])
+
+    def test_values_are_cached_once_indexed(self):
+        with mock.patch.object(self.connection, "nsdchat_call",
+                               side_effect=self.call) as nsdchat_call:
+            self.assertEqual(self.entry.status(), "unknown")
+            self.assertEqual(self.entry.btime(), ["0"])
+            self.values = {"status": ["indexed"], "btime": ["1700000000"]}
+            self.assertEqual(self.entry.btime(), ["1700000000"])
+            self.assertEqual(self.entry.status(), "indexed")
+            self.assertEqual(self.entry.btime(), ["1700000000"])
+            self.assertEqual(self.entry.btime(), ["1700000000"])
+        self.assertEqual(nsdchat_call.call_count, 5)
+
+    def test_batch(self):
+        with mock.patch.object(archiveentry, "exec_nsdchat_batch",
+                               side_effect=lambda cmds, conn:
+                               [self.call(cmd) for cmd in cmds]):
+            ArchiveEntry.batch([self.entry], ("btime", "status"),
+                               self.connection)
+            self.assertNotIn(("btime",), self.entry._cache)
+            self.values = {"status": ["indexed"], "btime": ["1700000000"]}
+            ArchiveEntry.batch([self.entry], ("btime", "status"),
+                               self.connection)
+        self.assertEqual(self.entry._cache[("btime",)], ["1700000000"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Checks how ArchiveIndex.inventory_stream treats its output file and the
+connection the inventory runs on.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+from awp5.base.connection import Connection
+from awp5.base.helpers import strings
+from awp5.api import archiveindex
+
+
+class InventoryStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        self.index = archiveindex.ArchiveIndex("Default", self.connection)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "inventory")
+
+    def test_existing_file_is_kept(self):
+        with open(self.path, "w") as output:
+            output.write("old\n")
+        with self.assertRaises(ValueError):
+            list(self.index.inventory_stream("localhost:" + self.path))
+        with open(self.path) as output:
+            self.assertEqual(output.read(), "old\n")
+
+    def test_inventory_borrows_a_connection(self):
+        def inventory(cmd, p5_connection):
+            with open(self.path, "w") as output:
+                output.write("/a\t1\n/b\t2\n")
+            return ["localhost:" + self.path]
+        with mock.patch.object(archiveindex, "exec_nsdchat",
+                               side_effect=inventory) as exec_nsdchat:
+            rows = list(self.index.inventory_stream("localhost:" + self.path,
+                                                    poll_interval=0.01))
+        self.assertEqual(rows, [("/a", "1"), ("/b", "2")])
+        cmd, p5_connection = exec_nsdchat.call_args[0]
+        self.assertEqual(strings(cmd), ["ArchiveIndex", "Default", "inventory",
+                                        "localhost:" + self.path])
+        self.assertIs(p5_connection, self.connection)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Checks the nsdchat commands of the ArchiveSelection add helpers which work on
+local paths.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+from awp5.base import metacache
+from awp5.base.connection import Connection
+from awp5.api import archiveselection
+
+
+def touch(path):
+    with open(path, "w"):
+        pass
+
+
+class AddTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        metacache.cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = os.path.join(tmp.name, "a tree")
+        os.makedirs(os.path.join(self.root, "sub{1}"))
+        touch(os.path.join(self.root, "sub{1}", "file"))
+
+    def sent(self, **options):
+        with mock.patch.object(archiveselection, "exec_nsdchat_batch",
+                               side_effect=lambda cmds, conn, bound=False:
+                               [["1"] for cmd in cmds]) as batch:
+            archiveselection.add_tree("S", self.root,
+                                      p5_connection=self.connection,
+                                      **options)
+        return [cmd[3] for cmd in batch.call_args[0][0]]
+
+    def test_root_is_quoted(self):
+        self.assertEqual(self.sent(), ["{" + self.root + "}"])
+
+    def test_scanned_paths_are_quoted(self):
+        scanned = []
+        self.assertEqual(
+            self.sent(include=lambda path: scanned.append(path) or True),
+            ["{" + self.root + "}",
+             "{" + os.path.join(self.root, "sub\\{1\\}") + "}",
+             "{" + os.path.join(self.root, "sub\\{1\\}", "file") + "}"])
+        # include gets the plain local path
+        self.assertEqual(scanned,
+                         [os.path.join(self.root, "sub{1}", "file")])
+
+
+class AddDeltaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        metacache.cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.statefile = os.path.join(tmp.name, "state.json")
+        self.paths = [os.path.join(tmp.name, name)
+                      for name in ("a file", "b", "c")]
+        for path in self.paths:
+            touch(path)
+
+    def add_delta(self, results):
+        with mock.patch.object(archiveselection, "exec_nsdchat_batch",
+                               return_value=results) as batch:
+            added = archiveselection.add_delta(
+                "S", self.paths, self.statefile, as_object=True,
+                p5_connection=self.connection)
+        return added, [cmd[3] for cmd in batch.call_args[0][0]]
+
+    def test_paths_are_quoted(self):
+        added, sent = self.add_delta([["h1"], ["h2"], ["h3"]])
+        self.assertEqual(sent, ["{" + self.paths[0] + "}"] + self.paths[1:])
+        self.assertEqual([path for path, _ in added], self.paths)
+
+    def submit(self, result):
+        with mock.patch.object(archiveselection, "submit_nsdchat",
+                               side_effect=lambda cmd, conn, transform,
+                               bound: transform(result) if result else None):
+            return archiveselection.submit("S", statefile=self.statefile,
+                                           p5_connection=self.connection)
+
+    def test_only_failed_paths_are_sent_again(self):
+        # b was not added ("<empty>"), c failed
+        added, _ = self.add_delta([["h1"], ["<empty>"], None])
+        self.assertEqual([entry for _, entry in added][1:], [None, None])
+        self.assertEqual(self.submit(["10001"]), "10001")
+        _, sent = self.add_delta([["h3"]])
+        self.assertEqual(sent, [self.paths[2]])
+
+    def test_paths_are_sent_again_until_submitted(self):
+        self.add_delta([["h1"], ["h2"], ["h3"]])
+        _, sent = self.add_delta([["h1"], ["h2"], ["h3"]])
+        self.assertEqual(len(sent), 3)
+        self.assertIsNone(self.submit(None))
+        _, sent = self.add_delta([["h1"], ["h2"], ["h3"]])
+        self.assertEqual(len(sent), 3)
+        self.submit(["10001"])
+        _, sent = self.add_delta([])
+        self.assertEqual(sent, [])
+
+
+class SubmitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        metacache.cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.statefile = os.path.join(tmp.name, "state.json")
+        self.path = os.path.join(tmp.name, "file")
+        touch(self.path)
+        self.sent = []
+        patcher = mock.patch.object(archiveselection, "submit_nsdchat",
+                                    side_effect=self.submit_nsdchat)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        batch = mock.patch.object(archiveselection, "exec_nsdchat_batch",
+                                  side_effect=lambda cmds, conn, bound=False:
+                                  [["h"] for cmd in cmds])
+        batch.start()
+        self.addCleanup(batch.stop)
+
+    def submit_nsdchat(self, cmd, p5_connection, transform=None,
+                       bound=False):
+        self.sent.append(list(cmd))
+        result = {"submit": ["10001"], "destroy": ["0"]}.get(cmd[2], ["h"])
+        return transform(result) if transform else result
+
+    def selection(self, name):
+        selection = archiveselection.ArchiveSelection(name, self.connection)
+        selection.add_delta([self.path], self.statefile)
+        return selection
+
+    def test_unchanged_delta_is_not_submitted(self):
+        self.assertEqual(self.selection("S1").submit(as_object=False),
+                         "10001")
+        self.sent = []
+        self.assertEqual(self.selection("S2").submit(as_object=False),
+                         "10001")
+        self.assertEqual(self.sent, [["ArchiveSelection", "S2", "destroy"]])
+
+    def test_other_adds_are_submitted(self):
+        self.selection("S1").submit(as_object=False)
+        selection = self.selection("S2")
+        selection.addentry("/other")
+        self.sent = []
+        selection.submit(as_object=False)
+        self.assertEqual([cmd[2] for cmd in self.sent], ["submit"])
+
+
+class SessionTest(unittest.TestCase):
+    """
+    A selection is only known to the session which created it, so all its
+    commands have to run there, one after another.
+    """
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        self.connection.batch_size = 4
+        metacache.cache.clear()
+        self.events = []
+
+    def spawn(self, connection, cmd):
+        self.events.append(("spawn", connection.session_id, cmd[2]))
+        return mock.Mock(returncode=0)
+
+    def collect(self, connection, process, cmd, timeout):
+        self.events.append(("collect", connection.session_id, cmd[2]))
+        return ["1"]
+
+    def run_commands(self, commands):
+        with mock.patch.object(Connection, "_spawn", autospec=True,
+                               side_effect=self.spawn), \
+                mock.patch.object(Connection, "_collect", autospec=True,
+                                  side_effect=self.collect):
+            commands(archiveselection.ArchiveSelection("S",
+                                                       self.connection))
+        self.assertEqual({session for _, session, _ in self.events},
+                         {self.connection.session_id})
+        # each command completes before the next one starts
+        self.assertEqual([event for event, _, _ in self.events],
+                         ["spawn", "collect"] * (len(self.events) // 2))
+        return [method for event, _, method in self.events
+                if event == "spawn"]
+
+    def test_pipeline(self):
+        def commands(selection):
+            with selection.pipeline():
+                for path in ("/a", "/b", "/c"):
+                    selection.addentry(path)
+                selection.submit(as_object=False)
+        self.assertEqual(self.run_commands(commands),
+                         ["addentry"] * 3 + ["submit"])
+
+    def test_add_entries(self):
+        def commands(selection):
+            selection.add_entries(["/a", "/b", "/c"])
+            selection.destroy()
+        self.assertEqual(self.run_commands(commands),
+                         ["addentry"] * 3 + ["destroy"])
+
+
+if __name__ == "__main__":
+    unittest.main()
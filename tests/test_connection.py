@@ -0,0 +1,141 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Checks that the concurrent nsdchat processes of a batch each run on a P5
+session of their own.
+"""
+import asyncio
+import threading
+import unittest
+from unittest import mock
+from awp5.base.connection import Connection, ConnectionPool
+
+
+class Process(object):
+    returncode = 0
+
+    def __init__(self, connection, cmd):
+        self.connection = connection
+        self.cmd = cmd
+
+
+class NsdchatBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        self.connection.batch_size = 4
+        self.pool = ConnectionPool(maxsize=8)
+        patcher = mock.patch("awp5.base.connection.connection_pool",
+                             self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_batch(self, cmds, result=None):
+        # each result is the session id of the connection that collected
+        # the process, and that must be the one which spawned it
+        def collect(connection, process, cmd, timeout):
+            self.assertIs(process.connection, connection)
+            if result:
+                return result(connection, cmd)
+            return [connection.session_id]
+        with mock.patch.object(Connection, "_spawn", autospec=True,
+                               side_effect=Process), \
+                mock.patch.object(Connection, "_collect", autospec=True,
+                                  side_effect=collect):
+            return self.connection.nsdchat_batch(cmds)
+
+    def test_sessions(self):
+        results = self.run_batch([["srvinfo", str(i)] for i in range(6)])
+        sessions = [result[0] for result in results]
+        # the first command of each window runs on the connection itself
+        self.assertEqual(sessions[0], self.connection.session_id)
+        self.assertEqual(sessions[4], self.connection.session_id)
+        self.assertEqual(len(set(sessions[:4])), 4)
+        self.assertEqual(len(set(sessions[4:])), 2)
+
+    def test_errors_come_from_the_failed_session(self):
+        def result(connection, cmd):
+            if cmd[1] == "2":
+                return connection._result(1, b"", cmd)
+            return [connection.session_id]
+        with mock.patch.object(Connection, "geterror", autospec=True,
+                               side_effect=lambda connection:
+                               connection.session_id) as geterror:
+            results = self.run_batch([["srvinfo", str(i)]
+                                      for i in range(4)], result)
+        self.assertIsNone(results[2])
+        failed = geterror.call_args[0][0]
+        self.assertNotIn([failed.session_id], results)
+        self.assertIsNot(failed, self.connection)
+
+    def test_siblings_are_released(self):
+        self.run_batch([["srvinfo", str(i)] for i in range(4)])
+        idle = self.pool._idle[ConnectionPool._key(self.connection)]
+        self.assertEqual(len(idle), 3)
+        self.assertTrue(all(not sibling._busy.locked()
+                            for sibling, _ in idle))
+
+    def test_last_connection_is_not_a_sibling(self):
+        self.addCleanup(setattr, Connection, "last_connection",
+                        Connection.last_connection)
+        self.run_batch([["srvinfo", str(i)] for i in range(4)],
+                       lambda connection, cmd:
+                       connection._result(0, b"1", cmd))
+        self.assertIs(Connection.last_connection, self.connection)
+
+    def test_failed_siblings_are_dropped(self):
+        def result(connection, cmd):
+            if cmd[1] == "2":
+                raise OSError("nsdchat failed")
+            return ["1"]
+        with self.assertRaises(OSError):
+            self.run_batch([["srvinfo", str(i)] for i in range(4)], result)
+        self.assertFalse(self.pool._idle.get(
+            ConnectionPool._key(self.connection)))
+
+
+class TestTest(unittest.TestCase):
+
+    def test_server_error(self):
+        connection = Connection(p5_path="/nonexistent")
+        with mock.patch.object(Connection, "_spawn", autospec=True,
+                               side_effect=Process), \
+                mock.patch.object(Connection, "_collect", autospec=True,
+                                  return_value=None):
+            self.assertFalse(connection.test("5"))
+
+
+class AsyncProcess(object):
+    returncode = 1
+
+    async def communicate(self):
+        return b"", b""
+
+
+class NsdchatCallAsyncTest(unittest.TestCase):
+
+    def test_geterror_runs_off_the_event_loop(self):
+        connection = Connection(p5_path="/nonexistent")
+        threads = []
+
+        async def create_subprocess_exec(*args, **kwargs):
+            return AsyncProcess()
+
+        with mock.patch("asyncio.create_subprocess_exec",
+                        create_subprocess_exec), \
+                mock.patch.object(Connection, "geterror", autospec=True,
+                                  side_effect=lambda connection:
+                                  threads.append(threading.get_ident())):
+            result = asyncio.run(connection.nsdchat_call_async(["srvinfo"]))
+        self.assertIsNone(result)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+
+if __name__ == "__main__":
+    unittest.main()
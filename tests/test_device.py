@@ -0,0 +1,49 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Checks that inventory_all runs no more inventories at once than a tape
+library has drives for.
+"""
+import unittest
+from unittest import mock
+from awp5.base.connection import Connection
+from awp5.api import device
+
+
+class InventoryAllTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        self.device_names = ["d{}".format(i) for i in range(6)]
+        self.batches = []
+
+    def fields(self, module_name, device_names, fields, p5_connection):
+        self.batches.append(list(device_names))
+        return {name: {"inventory": "V" + name} for name in device_names}
+
+    def inventory_all(self, **kwargs):
+        with mock.patch.object(device, "names",
+                               return_value=self.device_names), \
+                mock.patch.object(device, "exec_nsdchat_fields",
+                                  side_effect=self.fields):
+            return device.inventory_all(self.connection, **kwargs)
+
+    def test_default_concurrency(self):
+        self.assertEqual(self.inventory_all(),
+                         {name: "V" + name for name in self.device_names})
+        self.assertEqual(self.batches, [self.device_names[:4],
+                                        self.device_names[4:]])
+
+    def test_concurrency(self):
+        self.inventory_all(concurrency=1)
+        self.assertEqual(self.batches, [[name]
+                                        for name in self.device_names])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Checks that LazyResourceList can stand in for the list resourcelist returns.
+"""
+import json
+import unittest
+from awp5.base.connection import Connection
+from awp5.base.helpers import LazyResourceList, resourcelist
+from awp5.api.archiveindex import ArchiveIndex
+
+
+class LazyResourceListTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        self.result = ["Default", "Media", "Projects"]
+        self.lazy = LazyResourceList(self.result, ArchiveIndex,
+                                     self.connection)
+
+    def test_is_a_list(self):
+        self.assertIsInstance(self.lazy, list)
+        self.assertEqual(len(self.lazy), 3)
+        self.assertEqual(self.lazy, resourcelist(self.result, ArchiveIndex,
+                                                 self.connection))
+        self.assertEqual(json.dumps(self.lazy, default=str),
+                         json.dumps(self.result))
+
+    def test_objects_are_created_once(self):
+        self.assertIsInstance(self.lazy[1], ArchiveIndex)
+        self.assertIs(self.lazy[1], self.lazy[-2])
+        self.assertIs(list(self.lazy)[1], self.lazy[1])
+        self.assertEqual([index.name for index in reversed(self.lazy)],
+                         self.result[::-1])
+        self.assertEqual([index.name for index in self.lazy[:2]],
+                         self.result[:2])
+        self.assertIn("Media", self.lazy)
+
+    def test_no_resource(self):
+        self.assertEqual(LazyResourceList(["<empty>"], ArchiveIndex,
+                                          self.connection), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
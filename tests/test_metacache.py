@@ -0,0 +1,150 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Checks that writes drop the cached query results they change, and that a
+query answered before such a write completes does not cache its old value.
+"""
+import unittest
+from unittest import mock
+from awp5.base import metacache
+from awp5.base.connection import Batch, Connection
+from awp5.base.metacache import TTLCache
+from awp5.api import archiveindex, archiveplan, archiveselection
+from awp5.api import backup2go
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def test_set_after_invalidate_is_stale(self):
+        cache = TTLCache()
+        since = cache.token()
+        cache.invalidate(("a", "b"))
+        cache.set(("a", "b", "c"), 1, since=since)
+        self.assertIsNone(cache.get(("a", "b", "c")))
+        cache.set(("a", "x"), 1, since=since)
+        self.assertEqual(cache.get(("a", "x")), 1)
+
+    def test_set_after_token_is_kept(self):
+        cache = TTLCache()
+        cache.invalidate(("a",))
+        since = cache.token()
+        cache.set(("a", "b"), 1, since=since)
+        self.assertEqual(cache.get(("a", "b")), 1)
+
+    def test_forgotten_invalidations_count_as_stale(self):
+        cache = TTLCache(maxsize=2)
+        since = cache.token()
+        for name in "abcd":
+            cache.invalidate((name,))
+        cache.set(("x",), 1, since=since)
+        self.assertIsNone(cache.get(("x",)))
+
+
+class KeysetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        metacache.cache.clear()
+
+    def keyget(self):
+        return archiveindex.keyget("Default", "k", "a",
+                                   p5_connection=self.connection)
+
+    def test_keyset_drops_keyget(self):
+        with mock.patch.object(metacache, "exec_nsdchat",
+                               return_value=["old"]):
+            self.assertEqual(self.keyget(), ["old"])
+        with mock.patch.object(archiveindex, "submit_nsdchat",
+                               side_effect=lambda cmd, conn, transform:
+                               transform(["1"])):
+            archiveindex.keyset("Default", "k", "a", "new",
+                                p5_connection=self.connection)
+        with mock.patch.object(metacache, "exec_nsdchat",
+                               return_value=["new"]):
+            self.assertEqual(self.keyget(), ["new"])
+
+    def batched(self, keyget_first):
+        # keyget and keyset run at once, so the keyget answer may predate
+        # the keyset
+        results = {"keyget": ["old"], "keyset": ["1"]}
+        with mock.patch("awp5.base.connection.exec_nsdchat_batch",
+                        side_effect=lambda cmds, conn, bound=False:
+                        [results[cmd[2]] for cmd in cmds]):
+            with Batch(self.connection):
+                if keyget_first:
+                    queued = self.keyget()
+                archiveindex.keyset("Default", "k", "a", "new",
+                                    p5_connection=self.connection)
+                if not keyget_first:
+                    queued = self.keyget()
+        self.assertEqual(queued.result(), ["old"])
+        with mock.patch.object(metacache, "exec_nsdchat",
+                               return_value=["new"]):
+            self.assertEqual(self.keyget(), ["new"])
+
+    def test_keyget_batched_before_keyset_is_not_cached(self):
+        self.batched(keyget_first=True)
+
+    def test_keyget_batched_after_keyset_is_not_cached(self):
+        self.batched(keyget_first=False)
+
+
+class WriteTest(unittest.TestCase):
+    """
+    A query batched after a write may be answered before the write is, so
+    the write has to drop its result once it has completed.
+    """
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        metacache.cache.clear()
+
+    def assertWriteDrops(self, query, write):
+        with mock.patch("awp5.base.connection.exec_nsdchat_batch",
+                        side_effect=lambda cmds, conn, bound=False:
+                        [["old"] for cmd in cmds]):
+            with Batch(self.connection):
+                write(p5_connection=self.connection)
+                queued = query(p5_connection=self.connection)
+        self.assertEqual(queued.result(), "old")
+        with mock.patch.object(metacache, "exec_nsdchat",
+                               return_value=["new"]):
+            self.assertEqual(query(p5_connection=self.connection), "new")
+
+    def test_archiveplan(self):
+        def query(**kwargs):
+            return archiveplan.database("P", **kwargs)
+        for write in (lambda **kwargs:
+                      archiveplan.database("P", "new", **kwargs),
+                      lambda **kwargs: archiveplan.disable("P", **kwargs),
+                      lambda **kwargs: archiveplan.run("P", **kwargs)):
+            metacache.cache.clear()
+            self.assertWriteDrops(query, write)
+
+    def test_backup2go(self):
+        def query(**kwargs):
+            return backup2go.maxrunning("T", **kwargs)
+        for write in (lambda **kwargs:
+                      backup2go.maxrunning("T", "4", **kwargs),
+                      lambda **kwargs: backup2go.enable("T", **kwargs)):
+            metacache.cache.clear()
+            self.assertWriteDrops(query, write)
+
+    def test_archiveselection(self):
+        def query(**kwargs):
+            return archiveselection.level("S", **kwargs)
+        for write in (lambda **kwargs:
+                      archiveselection.level("S", "full", **kwargs),
+                      lambda **kwargs:
+                      archiveselection.describe("S", "title", **kwargs)):
+            metacache.cache.clear()
+            self.assertWriteDrops(query, write)
+
+
+if __name__ == "__main__":
+    unittest.main()
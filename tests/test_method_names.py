@@ -0,0 +1,87 @@
+# -------------------------------------------------------------------------
+# Copyright (c) Thomas Waldinger. All rights reserved.
+# Licensed under the Apache License, Version 2.0. See
+# License.txt in the project root for license
+# information.
+# ---------------
+
+"""
+Checks that the wrappers send their own nsdchat method name. Several of them
+used to send the method name of the wrapper they were copied from.
+"""
+import unittest
+from unittest import mock
+from awp5.base import metacache
+from awp5.base.connection import Connection
+from awp5.base.helpers import strings
+from awp5.api import archiveindex, jukebox, pool, server, volume
+from awp5.api import workstation
+
+
+class MethodNameTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = Connection(p5_path="/nonexistent")
+        metacache.cache.clear()
+
+    def assertArgv(self, call, argv):
+        # the words nsdchat would be called with
+        self.assertEqual(strings(call.call_args[0][0]), argv)
+
+    def assertSends(self, module, function, args, argv):
+        with mock.patch.object(module, "exec_nsdchat",
+                               return_value=["1"]) as exec_nsdchat:
+            function(*args, p5_connection=self.connection)
+        self.assertArgv(exec_nsdchat, argv)
+
+    def assertMethodSends(self, method, args, argv):
+        with mock.patch.object(self.connection, "nsdchat_call",
+                               return_value=["1"]) as nsdchat_call:
+            method(*args)
+        self.assertArgv(nsdchat_call, argv)
+
+    def test_archiveindex_keyget(self):
+        self.assertSends(metacache, archiveindex.keyget, ("Default", "k"),
+                         ["ArchiveIndex", "Default", "keyget", "k"])
+        metacache.cache.clear()
+        index = archiveindex.ArchiveIndex("Default", self.connection)
+        with mock.patch.object(metacache, "exec_nsdchat",
+                               return_value=["1"]) as exec_nsdchat:
+            index.keyget("k", "type")
+        self.assertArgv(exec_nsdchat,
+                        ["ArchiveIndex", "Default", "keyget", "k", "type"])
+
+    def test_jukebox_label(self):
+        self.assertSends(jukebox, jukebox.label, ("jb", "pool", "1"),
+                         ["Jukebox", "jb", "label", "pool", "1"])
+        self.assertMethodSends(
+            jukebox.Jukebox("jb", self.connection).label, ("pool", "1"),
+            ["Jukebox", "jb", "label", "pool", "1"])
+
+    def test_pool_enabled(self):
+        self.assertSends(pool, pool.enabled, ("p",), ["Pool", "p", "enabled"])
+        self.assertMethodSends(pool.Pool("p", self.connection).enabled, (),
+                               ["Pool", "p", "enabled"])
+
+    def test_server_submit(self):
+        self.assertSends(server, server.submit, ("s",),
+                         ["Server", "s", "submit", "now"])
+        self.assertMethodSends(server.Server("s", self.connection).submit,
+                               (), ["Server", "s", "submit", "now"])
+
+    def test_volume_jobs(self):
+        self.assertSends(volume, volume.jobs, ("v",), ["Volume", "v", "jobs"])
+        self.assertMethodSends(volume.Volume("v", self.connection).jobs, (),
+                               ["Volume", "v", "jobs"])
+
+    def test_workstation_totals(self):
+        ws = workstation.Workstation("w", self.connection)
+        for method_name in ("totalfiles", "totalkbytes", "retaintime"):
+            argv = ["Workstation", "w", method_name]
+            self.assertSends(workstation, getattr(workstation, method_name),
+                             ("w",), argv)
+            self.assertMethodSends(getattr(ws, method_name), (), argv)
+
+
+if __name__ == "__main__":
+    unittest.main()